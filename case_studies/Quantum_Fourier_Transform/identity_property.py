@@ -7,9 +7,10 @@ from qiskit.extensions import UnitaryGate
 from qiskit.quantum_info import random_statevector, Statevector, Operator, random_unitary
 
 from case_studies.property_based_test_interface import PropertyBasedTestInterface
-from dd_regression.assertions.statistical_analysis import assert_equal, assert_equal_state, measure_qubits, \
-    assert_equal_distributions, assert_equal_distributions_chi
-from dd_regression.helper_functions import get_circuit_register, list_to_circuit
+from dd_regression.assertions.statistical_analysis import measure_qubits, reference_qubit_probabilities, \
+    assert_distributions_match_probabilities, assert_equal_distributions, sequential_test
+from dd_regression.helper_functions import get_circuit_register
+from dd_regression.property_based_oracle import ExperimentRecord
 
 warnings.simplefilter(action='ignore', category=FutureWarning)
 warnings.simplefilter(action='ignore', category=RuntimeWarning)
@@ -19,8 +20,10 @@ backend = Aer.get_backend('aer_simulator')
 
 
 class IdentityProperty(PropertyBasedTestInterface):
+    p_values_per_input = 9
+
     @staticmethod
-    def property_based_test(circuit, inputs_to_generate=25, measurements=1000):
+    def property_based_test(circuit, inputs_to_generate=25, measurements=1000, engine="shots", looks=1):
         # print("inside equal output property based test call")
         log = False
         experiments = []
@@ -43,49 +46,52 @@ class IdentityProperty(PropertyBasedTestInterface):
                 print(id_circuit.draw(vertical_compression='high', fold=300))
                 print(only_unitary.draw(vertical_compression='high', fold=300))
 
-            base_measurements = measure_qubits(id_circuit, [0, 1, 2], measurements=measurements)
-            only_unitary_measurements = measure_qubits(only_unitary, [0, 1, 2], measurements=measurements)
+            # compare the output of the merged circuit to test, with an empty circuit initialised to expected state
+            # p_list = assert_equal_distributions(base_measurements, only_unitary_measurements)
+            # the expected distribution is known exactly, so the measurements are compared to its probabilities
+            expected_probabilities = reference_qubit_probabilities(only_unitary, [0, 1, 2])
+            p_val, (base_measurements,) = sequential_test(
+                lambda shots: (measure_qubits(id_circuit.copy(), [0, 1, 2], measurements=shots, engine=engine),),
+                lambda measured: assert_distributions_match_probabilities(measured, expected_probabilities),
+                measurements=measurements, looks=looks)
 
             if log:
                 print(base_measurements)
-                print(only_unitary_measurements)
-
-            # compare the output of the merged circuit to test, with an empty circuit initialised to expected state
-            # p_list = assert_equal_distributions(base_measurements, only_unitary_measurements)
-            p_val = assert_equal_distributions(base_measurements, only_unitary_measurements)
+                print(expected_probabilities)
 
             if log:
                 print(p_val)
 
-            # add a tuple of 3 elements index, initialised vector, p values, measurements
+            # add a record of the index, initialised vector, p values, measurements
             # experiments.append([i, [1, 0, 0, 0, 0, 0, 0, 0], (
             #     p_list[0], p_list[1], p_list[2], p_list[3], p_list[4], p_list[5], p_list[6], p_list[7], p_list[8]),
             #                     (base_measurements, only_unitary_measurements), operator])
 
-            experiments.append([i, [1, 0, 0, 0, 0, 0, 0, 0], [i for i in p_val], (base_measurements, only_unitary_measurements), operator])
+            experiments.append(ExperimentRecord(i, [1, 0, 0, 0, 0, 0, 0, 0], p_val, (base_measurements,),
+                                                extra_info=(operator,),
+                                                expected_probabilities=expected_probabilities))
 
         return experiments
 
     @staticmethod
-    def verification_heuristic(property_idx, exp_idx, original_failing_circuit, output_distribution, input_state_list,
-                               extra_info=None, measurements=1000):
+    def verification_circuit(failing_circuit, input_state_list, extra_info=None):
         # print("verification heuristic")
 
-        qlength, clength = get_circuit_register(original_failing_circuit)
+        qlength, clength = get_circuit_register(failing_circuit)
 
         id_circuit = QuantumCircuit(qlength)
-        id_circuit = id_circuit.compose(list_to_circuit(original_failing_circuit))
+        id_circuit = id_circuit.compose(failing_circuit)
         for num in range(len(qlength)):
             id_circuit.h(num)
         id_circuit.unitary(extra_info[0], [0, 1, 2])
 
-        # print(inputted_circuit_to_test)
+        return id_circuit, [0, 1, 2], ['x', 'y', 'z']
 
-        base_measurements = measure_qubits(id_circuit, [0, 1, 2], measurements=measurements)
-
-        # print(base_measurements)
+    @staticmethod
+    def verification_p_values(measurements_1, output_distribution, extra_info=None):
+        # print(measurements_1)
         # print(output_distribution)
 
-        p_val = assert_equal_distributions(base_measurements, output_distribution)
+        p_val = assert_equal_distributions(measurements_1, output_distribution)
 
-        return [property_idx, exp_idx, [i for i in p_val]]
+        return [i for i in p_val]
@@ -7,9 +7,10 @@ from qiskit.extensions import UnitaryGate
 from qiskit.quantum_info import random_statevector, Statevector, Operator
 
 from case_studies.property_based_test_interface import PropertyBasedTestInterface
-from dd_regression.assertions.statistical_analysis import assert_equal, assert_equal_state, measure_qubits, \
-    assert_equal_distributions
-from dd_regression.helper_functions import get_circuit_register, list_to_circuit
+from dd_regression.assertions.statistical_analysis import measure_qubits_batch, assert_equal_distributions, \
+    sequential_test
+from dd_regression.helper_functions import get_circuit_register
+from dd_regression.property_based_oracle import ExperimentRecord
 
 warnings.simplefilter(action='ignore', category=FutureWarning)
 warnings.simplefilter(action='ignore', category=RuntimeWarning)
@@ -19,8 +20,10 @@ backend = Aer.get_backend('aer_simulator')
 
 
 class PhaseShiftProperty(PropertyBasedTestInterface):
+    p_values_per_input = 9
+
     @staticmethod
-    def property_based_test(circuit, inputs_to_generate=25, measurements=1000):
+    def property_based_test(circuit, inputs_to_generate=25, measurements=1000, engine="shots", looks=1):
         # print("inside equal output property based test call")
         log = False
         experiments = []
@@ -48,50 +51,48 @@ class PhaseShiftProperty(PropertyBasedTestInterface):
                 print(phase_shifted_circuit_to_test.draw(vertical_compression='high', fold=300))
                 print(up_shifted_circuit_to_test.draw(vertical_compression='high', fold=300))
 
-            phase_shifted_measurements = measure_qubits(phase_shifted_circuit_to_test, [0, 1, 2], measurements=measurements)
-            up_shifted_measurements = measure_qubits(up_shifted_circuit_to_test, [0, 1, 2], measurements=measurements)
+            # compare the output of the merged circuit to test, with an empty circuit initialised to expected state
+            p_list, (phase_shifted_measurements, up_shifted_measurements) = sequential_test(
+                lambda shots: measure_qubits_batch(
+                    [phase_shifted_circuit_to_test.copy(), up_shifted_circuit_to_test.copy()], [[0, 1, 2], [0, 1, 2]],
+                    measurements=shots, engine=engine),
+                assert_equal_distributions, measurements=measurements, looks=looks)
 
             if log:
                 print(phase_shifted_measurements)
                 print(up_shifted_measurements)
-
-            # compare the output of the merged circuit to test, with an empty circuit initialised to expected state
-            p_list = assert_equal_distributions(phase_shifted_measurements, up_shifted_measurements)
             if log:
                 print(p_list)
 
-            # add a tuple of 3 elements index, initialised vector, p values, measurements
-            experiments.append([i, init_vect, (p_list[0], p_list[1], p_list[2], p_list[3], p_list[4], p_list[5], p_list[6], p_list[7], p_list[8]),
-                                (phase_shifted_measurements, up_shifted_measurements)])
+            # add a record of the index, initialised vector, p values, measurements
+            experiments.append(ExperimentRecord(i, init_vect, p_list,
+                                                (phase_shifted_measurements, up_shifted_measurements)))
 
         return experiments
 
     @staticmethod
-    def verification_heuristic(property_idx, exp_idx, original_failing_circuit, output_distribution, input_state_list,
-                               extra_info=None, measurements=1000):
+    def verification_circuit(failing_circuit, input_state_list, extra_info=None):
         log = False
         if log:
             print("verification heuristic")
 
-        qlength, clength = get_circuit_register(original_failing_circuit)
+        qlength, clength = get_circuit_register(failing_circuit)
         init_state = QuantumCircuit(qlength)
 
         init_state.initialize(input_state_list, [2, 1, 0])
-        inputted_circuit_to_test = init_state.compose(list_to_circuit(original_failing_circuit))
+        inputted_circuit_to_test = init_state.compose(failing_circuit)
         inputted_circuit_to_test = PhaseShiftProperty.phase_shift(inputted_circuit_to_test)
 
         if log:
             print(inputted_circuit_to_test)
 
-        measurements_1 = measure_qubits(inputted_circuit_to_test, [0, 1, 2], measurements=measurements)
-
-        if log:
-            print(measurements_1)
-            print(output_distribution)
+        return inputted_circuit_to_test, [0, 1, 2], ['x', 'y', 'z']
 
+    @staticmethod
+    def verification_p_values(measurements_1, output_distribution, extra_info=None):
         p_list = assert_equal_distributions(measurements_1, output_distribution)
 
-        return [property_idx, exp_idx, (p_list[0], p_list[1], p_list[2], p_list[3], p_list[4], p_list[5], p_list[6], p_list[7], p_list[8])]
+        return p_list[0], p_list[1], p_list[2], p_list[3], p_list[4], p_list[5], p_list[6], p_list[7], p_list[8]
 
     @staticmethod
     def phase_shift(qc):
@@ -7,7 +7,6 @@ from qiskit import QuantumCircuit, Aer
 from case_studies.case_study_interface import CaseStudyInterface
 from dd_regression.diff_algorithm import diff
 from dd_regression.helper_functions import files_to_spreadsheet
-from dd_regression.result_classes import Passed, Failed, Inconclusive
 from case_studies.Quantum_Fourier_Transform.phase_shift_property import PhaseShiftProperty
 from case_studies.Quantum_Fourier_Transform.up_shift_property import UpShiftProperty
 from case_studies.Quantum_Fourier_Transform.identity_property import IdentityProperty
@@ -83,11 +82,6 @@ class QuantumFourierTransform(CaseStudyInterface):
 
     def test_function(self, deltas, src_passing, src_failing, inputs_to_generate, selected_properties,
                       number_of_measurements, significance_level):
-        self.tests_performed += 1
-        if self.test_cache.get(tuple(deltas), None) is not None:
-            return self.test_cache.get(tuple(deltas), None)
-        self.tests_performed_no_cache += 1
-
         # print(f"chosen properties {selected_properties}")
 
         oracle_result = QuantumFourierTransformOracle.test_oracle(src_passing, src_failing, deltas,
@@ -95,14 +89,14 @@ class QuantumFourierTransform(CaseStudyInterface):
                                                                   inputs_to_generate=inputs_to_generate,
                                                                   measurements=number_of_measurements,
                                                                   significance_level=significance_level,
-                                                                  verification=self.apply_verification
+                                                                  verification=self.apply_verification,
+                                                                  incremental=self.incremental_correction,
+                                                                  executor=self.oracle_executor,
+                                                                  correction_method=self.correction_method,
+                                                                  verification_cache_key=self.verification_cache_key,
+                                                                  engine=self.measurement_engine,
+                                                                  looks=self.sequential_looks
                                                                   )
-        if isinstance(oracle_result, Passed):
-            self.test_cache[tuple(deltas)] = Passed()
-        elif isinstance(oracle_result, Failed):
-            self.test_cache[tuple(deltas)] = Failed()
-        elif isinstance(oracle_result, Inconclusive):
-            self.test_cache[tuple(deltas)] = Inconclusive()
         return oracle_result
 
 
@@ -7,9 +7,10 @@ from qiskit.extensions import UnitaryGate
 from qiskit.quantum_info import random_statevector, Statevector, Operator
 
 from case_studies.property_based_test_interface import PropertyBasedTestInterface
-from dd_regression.assertions.statistical_analysis import assert_equal, assert_equal_state, measure_qubits, \
-    assert_equal_distributions, assert_equal_distributions_chi
-from dd_regression.helper_functions import get_circuit_register, list_to_circuit
+from dd_regression.assertions.statistical_analysis import measure_qubits_batch, assert_equal_distributions, \
+    sequential_test, counts_array, count_keys
+from dd_regression.helper_functions import get_circuit_register
+from dd_regression.property_based_oracle import ExperimentRecord
 
 warnings.simplefilter(action='ignore', category=FutureWarning)
 warnings.simplefilter(action='ignore', category=RuntimeWarning)
@@ -19,8 +20,10 @@ backend = Aer.get_backend('aer_simulator')
 
 
 class UpShiftProperty(PropertyBasedTestInterface):
+    p_values_per_input = 9
+
     @staticmethod
-    def property_based_test(circuit, inputs_to_generate=25, measurements=1000):
+    def property_based_test(circuit, inputs_to_generate=25, measurements=1000, engine="shots", looks=1):
         # print("inside equal output property based test call")
         log = False
         experiments = []
@@ -66,59 +69,58 @@ class UpShiftProperty(PropertyBasedTestInterface):
                 print(inputted_circuit_to_test.draw(vertical_compression='high', fold=300))
                 print(shifted_circuit_to_test.draw(vertical_compression='high', fold=300))
 
-            base_measurements = measure_qubits(inputted_circuit_to_test, [0, 1, 2], measurements=measurements)
-            shifted_measurements = measure_qubits(shifted_circuit_to_test, [0, 1, 2], measurements=measurements)
-
-            if log:
-                print(init_int)
-                print(base_measurements)
+            def measure_shifted(shots):
+                base, shifted = measure_qubits_batch([inputted_circuit_to_test.copy(), shifted_circuit_to_test.copy()],
+                                                     [[0, 1, 2], [0, 1, 2]], measurements=shots, engine=engine)
+                return UpShiftProperty.up_shift(base, init_int), shifted
 
-            UpShiftProperty.up_shift(base_measurements, init_int)
+            # compare the output of the merged circuit to test, with an empty circuit initialised to expected state
+            p_val, (base_measurements, shifted_measurements) = sequential_test(measure_shifted,
+                                                                               assert_equal_distributions,
+                                                                               measurements=measurements, looks=looks)
 
             if log:
+                print(init_int)
                 print(base_measurements)
                 print(shifted_measurements)
 
-            # compare the output of the merged circuit to test, with an empty circuit initialised to expected state
-            p_val = assert_equal_distributions(base_measurements, shifted_measurements)
-
             if log:
                 print(p_val)
 
 
-            # add a tuple of 3 elements index, initialised vector, p values, measurements
-            experiments.append([i, init_vect, [i for i in p_val],
-                                (base_measurements, shifted_measurements), init_int])
+            # add a record of the index, initialised vector, p values, measurements
+            experiments.append(ExperimentRecord(i, init_vect, p_val,
+                                                (base_measurements, shifted_measurements), extra_info=(init_int,)))
 
         return experiments
 
     @staticmethod
-    def verification_heuristic(property_idx, exp_idx, original_failing_circuit, output_distribution, input_state_list,
-                               extra_info=None, measurements=1000):
+    def verification_circuit(failing_circuit, input_state_list, extra_info=None):
         # print("verification heuristic")
 
-        qlength, clength = get_circuit_register(original_failing_circuit)
+        qlength, clength = get_circuit_register(failing_circuit)
         init_state = QuantumCircuit(qlength)
 
         init_state.initialize(input_state_list, [0, 1, 2])
-        inputted_circuit_to_test = init_state.compose(list_to_circuit(original_failing_circuit).inverse())
+        inputted_circuit_to_test = init_state.compose(failing_circuit.inverse())
 
+        # print(inputted_circuit_to_test)
+
+        return inputted_circuit_to_test, [0, 1, 2], ['x', 'y', 'z']
+
+    @staticmethod
+    def verification_p_values(measurements_1, output_distribution, extra_info=None):
         init_int = extra_info[0]
         # print(init_int)
 
-        # print(inputted_circuit_to_test)
-
-        base_measurements = measure_qubits(inputted_circuit_to_test, [0, 1, 2], measurements=measurements)
-        UpShiftProperty.up_shift(base_measurements, init_int)
+        measurements_1 = UpShiftProperty.up_shift(measurements_1, init_int)
 
         # print(measurements_1)
         # print(output_distribution)
 
-        p_val = assert_equal_distributions(base_measurements, output_distribution)
+        p_val = assert_equal_distributions(measurements_1, output_distribution)
 
-
-        return [property_idx, exp_idx,
-                [i for i in p_val]]
+        return [i for i in p_val]
 
     @staticmethod
     def phase_shift(qc):
@@ -130,6 +132,8 @@ class UpShiftProperty(PropertyBasedTestInterface):
     @staticmethod
     # This could also be done through adding a circuit that subtracts the binary number by one (flipping 111 to 000)
     def up_shift(measurements, init_int):
+        # returns a shifted copy of the count array, the measurements may be shared (e.g. cached verifications)
+        measurements = counts_array(measurements).copy()
         if init_int % 2 == 1:
             ## NNF
             UpShiftProperty._swap_z(measurements[2])
@@ -142,10 +146,9 @@ class UpShiftProperty(PropertyBasedTestInterface):
             ## NFF
             UpShiftProperty._swap_z(measurements[1])
             UpShiftProperty._swap_z(measurements[2])
-
+        return measurements
 
     @staticmethod
-    def _swap_z(dict):
-        temp = dict['z0']
-        dict['z0'] = dict['z1']
-        dict['z1'] = temp
+    def _swap_z(qubit_counts):
+        z0, z1 = count_keys.index('z0'), count_keys.index('z1')
+        qubit_counts[[z0, z1]] = qubit_counts[[z1, z0]]
@@ -9,8 +9,10 @@ from qiskit.extensions import UnitaryGate
 
 from case_studies.property_based_test_interface import PropertyBasedTestInterface
 from dd_regression.assertions.statistical_analysis import assert_equal_distributions, \
-    measure_qubits
-from dd_regression.helper_functions import get_circuit_register, list_to_circuit
+    measure_qubits, reference_qubit_probabilities, assert_distributions_match_probabilities, \
+    sequential_test
+from dd_regression.helper_functions import get_circuit_register
+from dd_regression.property_based_oracle import ExperimentRecord
 
 warnings.simplefilter(action='ignore', category=FutureWarning)
 warnings.simplefilter(action='ignore', category=RuntimeWarning)
@@ -22,8 +24,10 @@ backend = Aer.get_backend('aer_simulator')
 class EigenvectorsDoNotModifyLowerReg(PropertyBasedTestInterface):
     """create pool of all possible eigenvectors and eigenvalues from the unitary"""
 
+    p_values_per_input = 9
+
     @staticmethod
-    def property_based_test(circuit, inputs_to_generate=25, measurements=1000):
+    def property_based_test(circuit, inputs_to_generate=25, measurements=1000, engine="shots", looks=1):
         """"set up simultaneous equation, unitary * eigenvector = eigenvalue * eigenvector 
             choose a non-zero element in eigenvector, compare it to same element in multiplied, rearrange for eigenvalue"""
         estimation_qubits = 2
@@ -79,37 +83,41 @@ class EigenvectorsDoNotModifyLowerReg(PropertyBasedTestInterface):
             # print(init_state2.draw(vertical_compression='high', fold=300))
 
             # probably do all measurements, and get only the z for this test
-            measurements_1 = measure_qubits(inputted_circuit_to_test, [i+estimation_qubits for i in range(unitary_qubits)], measurements=measurements)
-            measurements_2 = measure_qubits(init_state2, [i+estimation_qubits for i in range(unitary_qubits)], measurements=measurements)
+            lower_register = [i+estimation_qubits for i in range(unitary_qubits)]
+            # compare the output of the merged circuit to test, with an empty circuit initialised to expected state
+            # the expected distribution is known exactly, so the measurements are compared to its probabilities
+            expected_probabilities = reference_qubit_probabilities(init_state2, lower_register)
+            p_list, (measurements_1,) = sequential_test(
+                lambda shots: (measure_qubits(inputted_circuit_to_test.copy(), lower_register, measurements=shots,
+                                              engine=engine),),
+                lambda measured: assert_distributions_match_probabilities(measured, expected_probabilities),
+                measurements=measurements, looks=looks)
 
             # print(measurements_1)
-            # print(measurements_2)
-
-            # compare the output of the merged circuit to test, with an empty circuit initialised to expected state
-            p_list = assert_equal_distributions(measurements_1, measurements_2)
 
             # print(p_list)
 
-            # add a tuple of 3 elements index, initialised vector, p values, measurements
+            # add a record of the index, initialised vector, p values, measurements
             # make sure we pass all p_values
-            experiments.append([i, random_eigenvector, [i for i in p_list],
-                                (measurements_1, measurements_2)])
+            experiments.append(ExperimentRecord(i, random_eigenvector, p_list, (measurements_1,),
+                                                expected_probabilities=expected_probabilities))
 
         return experiments
 
     @staticmethod
-    def verification_heuristic(property_idx, exp_idx, original_failing_circuit, output_distribution, input_state_list,
-                               extra_info=None, measurements=500):
-        qlength, clength = get_circuit_register(original_failing_circuit)
+    def verification_circuit(failing_circuit, input_state_list, extra_info=None):
+        qlength, clength = get_circuit_register(failing_circuit)
         init_state = QuantumCircuit(qlength)
         estimation_qubits = 2
         unitary_qubits = 3
 
-        init_state.initialize(input_state_list, [i+estimation_qubits for i in range(unitary_qubits)])
-        inputted_circuit_to_test = init_state.compose(list_to_circuit(original_failing_circuit))
+        init_state.initialize(input_state_list, [i + estimation_qubits for i in range(unitary_qubits)])
+        inputted_circuit_to_test = init_state.compose(failing_circuit)
 
-        measurements_1 = measure_qubits(inputted_circuit_to_test, [i+estimation_qubits for i in range(unitary_qubits)], measurements=measurements)
+        return inputted_circuit_to_test, [i + estimation_qubits for i in range(unitary_qubits)], ['x', 'y', 'z']
 
+    @staticmethod
+    def verification_p_values(measurements_1, output_distribution, extra_info=None):
         # print("verif")
         # print(measurements_1)
         # print(output_distribution)
@@ -118,5 +126,4 @@ class EigenvectorsDoNotModifyLowerReg(PropertyBasedTestInterface):
         # make sure we are unpacking all p values from assert equal
         p_list = assert_equal_distributions(measurements_1, output_distribution)
 
-        return [property_idx, exp_idx,
-                [i for i in p_list]]
+        return [i for i in p_list]
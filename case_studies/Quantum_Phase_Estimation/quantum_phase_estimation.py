@@ -16,7 +16,6 @@ from case_studies.Quantum_Phase_Estimation.eigenvectors_do_not_modify_lower_reg_
 from case_studies.Quantum_Phase_Estimation.quantum_phase_estimation_oracle import PhaseEstimationOracle
 from dd_regression.diff_algorithm import diff
 from dd_regression.helper_functions import files_to_spreadsheet
-from dd_regression.result_classes import Passed, Failed, Inconclusive
 
 warnings.simplefilter(action='ignore', category=FutureWarning)
 warnings.simplefilter(action='ignore', category=RuntimeWarning)
@@ -149,11 +148,6 @@ class QuantumPhaseEstimation(CaseStudyInterface):
 
     def test_function(self, deltas, src_passing, src_failing, inputs_to_generate, selected_properties,
                       number_of_measurements, significance_level):
-        self.tests_performed += 1
-        if self.test_cache.get(tuple(deltas), None) is not None:
-            return self.test_cache.get(tuple(deltas), None)
-        self.tests_performed_no_cache += 1
-
         # print(f"chosen properties {selected_properties}")
 
         oracle_result = PhaseEstimationOracle.test_oracle(src_passing, src_failing, deltas,
@@ -161,14 +155,14 @@ class QuantumPhaseEstimation(CaseStudyInterface):
                                                           inputs_to_generate=inputs_to_generate,
                                                           measurements=number_of_measurements,
                                                           significance_level=significance_level,
-                                                          verification=self.apply_verification
+                                                          verification=self.apply_verification,
+                                                          incremental=self.incremental_correction,
+                                                          executor=self.oracle_executor,
+                                                          correction_method=self.correction_method,
+                                                          verification_cache_key=self.verification_cache_key,
+                                                          engine=self.measurement_engine,
+                                                          looks=self.sequential_looks
                                                           )
-        if isinstance(oracle_result, Passed):
-            self.test_cache[tuple(deltas)] = Passed()
-        elif isinstance(oracle_result, Failed):
-            self.test_cache[tuple(deltas)] = Failed()
-        elif isinstance(oracle_result, Inconclusive):
-            self.test_cache[tuple(deltas)] = Inconclusive()
         return oracle_result
 
 
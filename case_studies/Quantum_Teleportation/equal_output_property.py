@@ -4,8 +4,10 @@ from qiskit import QuantumCircuit, Aer
 from qiskit.quantum_info import random_statevector
 
 from case_studies.property_based_test_interface import PropertyBasedTestInterface
-from dd_regression.assertions.statistical_analysis import assert_equal, assert_equal_state
-from dd_regression.helper_functions import get_circuit_register, list_to_circuit
+from dd_regression.assertions.statistical_analysis import assert_equal_distributions, reference_qubit_probabilities, \
+    assert_distributions_match_probabilities, measure_qubits, sequential_test
+from dd_regression.helper_functions import get_circuit_register
+from dd_regression.property_based_oracle import ExperimentRecord
 
 warnings.simplefilter(action='ignore', category=FutureWarning)
 warnings.simplefilter(action='ignore', category=RuntimeWarning)
@@ -15,8 +17,10 @@ backend = Aer.get_backend('aer_simulator')
 
 
 class EqualOutputProperty(PropertyBasedTestInterface):
+    p_values_per_input = 3
+
     @staticmethod
-    def property_based_test(circuit, inputs_to_generate=25, measurements=1000):
+    def property_based_test(circuit, inputs_to_generate=25, measurements=1000, engine="shots", looks=1):
         # print("inside equal output property based test call")
         experiments = []
 
@@ -33,24 +37,31 @@ class EqualOutputProperty(PropertyBasedTestInterface):
             qc.initialize(init_vector, 0)
 
             # compare the output of the merged circuit to test, with an empty circuit initialised to expected state
-            p_value_x, p_value_y, p_value_z, measurements_1, measurements_2 = \
-                assert_equal(inputted_circuit_to_test, 2, qc, 0, measurements=measurements)
+            # the expected state is known exactly, so the measurements are compared to its probabilities
+            expected_probabilities = reference_qubit_probabilities(qc, [0])
+            (p_value_x, p_value_y, p_value_z), (measurements_1,) = sequential_test(
+                lambda shots: (measure_qubits(inputted_circuit_to_test.copy(), [2], measurements=shots, engine=engine),),
+                lambda measured: assert_distributions_match_probabilities(measured, expected_probabilities),
+                measurements=measurements, looks=looks)
 
-            # add a tuple of 3 elements index, initialised vector, p values, measurements
-            experiments.append([i, init_vector, (p_value_x, p_value_y, p_value_z), (measurements_1, measurements_2)])
+            # add a record of the index, initialised vector, p values, measurements
+            experiments.append(ExperimentRecord(i, init_vector, (p_value_x, p_value_y, p_value_z), (measurements_1,),
+                                                expected_probabilities=expected_probabilities))
 
         return experiments
 
     @staticmethod
-    def verification_heuristic(property_idx, exp_idx, original_failing_circuit, output_distribution, input_state_list,
-                               extra_info=None, measurements=1000):
-        qlength, clength = get_circuit_register(original_failing_circuit)
+    def verification_circuit(failing_circuit, input_state_list, extra_info=None):
+        qlength, clength = get_circuit_register(failing_circuit)
         init_state = QuantumCircuit(qlength)
 
         init_state.initialize(input_state_list, 0)
-        inputted_circuit_to_test = init_state.compose(list_to_circuit(original_failing_circuit))
+        inputted_circuit_to_test = init_state.compose(failing_circuit)
+
+        return inputted_circuit_to_test, [2], ['x', 'y', 'z']
 
-        p_value_x, p_value_y, p_value_z, _, _ = assert_equal_state(inputted_circuit_to_test, 2, output_distribution,
-                                                                   measurements=measurements)
+    @staticmethod
+    def verification_p_values(measurements_1, output_distribution, extra_info=None):
+        p_value_x, p_value_y, p_value_z = assert_equal_distributions(measurements_1, output_distribution)
 
-        return [property_idx, exp_idx, (p_value_x, p_value_y, p_value_z)]
+        return p_value_x, p_value_y, p_value_z
@@ -6,8 +6,10 @@ from qiskit.quantum_info import random_statevector
 
 from case_studies.property_based_test_interface import PropertyBasedTestInterface
 from dd_regression.assertions.statistical_analysis import assert_equal_distributions, \
-    measure_qubits
-from dd_regression.helper_functions import get_circuit_register, list_to_circuit
+    measure_qubits, reference_qubit_probabilities, assert_distributions_match_probabilities, \
+    sequential_test
+from dd_regression.helper_functions import get_circuit_register
+from dd_regression.property_based_oracle import ExperimentRecord
 
 warnings.simplefilter(action='ignore', category=FutureWarning)
 warnings.simplefilter(action='ignore', category=RuntimeWarning)
@@ -17,8 +19,10 @@ backend = Aer.get_backend('aer_simulator')
 
 
 class UniformSuperpositionProperty(PropertyBasedTestInterface):
+    p_values_per_input = 2
+
     @staticmethod
-    def property_based_test(circuit, inputs_to_generate=25, measurements=1000):
+    def property_based_test(circuit, inputs_to_generate=25, measurements=1000, engine="shots", looks=1):
         experiments = []
 
         for i in range(inputs_to_generate):
@@ -35,38 +39,44 @@ class UniformSuperpositionProperty(PropertyBasedTestInterface):
             qc.initialize(bell_state, [0, 1])
 
             # probably do all measurements, and get only the z for this test
-            measurements_1 = measure_qubits(inputted_circuit_to_test, [0, 1], basis=['z'], measurements=measurements)
-            measurements_2 = measure_qubits(qc, [0, 1], basis=['z'], measurements=measurements)
+            # compare the output of the merged circuit to test, with an empty circuit initialised to expected state
+            # the expected distribution is known exactly, so the measurements are compared to its probabilities
+            expected_probabilities = reference_qubit_probabilities(qc, [0, 1])
+            p_list, (measurements_1,) = sequential_test(
+                lambda shots: (measure_qubits(inputted_circuit_to_test.copy(), [0, 1], basis=['z'], measurements=shots,
+                                              engine=engine),),
+                lambda measured: assert_distributions_match_probabilities(measured, expected_probabilities,
+                                                                          basis=['z']),
+                measurements=measurements, looks=looks)
 
             # print(measurements_1)
-            # print(measurements_2)
-            # compare the output of the merged circuit to test, with an empty circuit initialised to expected state
-            p_list = assert_equal_distributions(measurements_1, measurements_2, basis=['z'])
 
             # print(p_list)
 
-            # add a tuple of 3 elements index, initialised vector, p values, measurements
-            experiments.append([i, init_vector, (p_list[0], p_list[1]), (measurements_1, measurements_2)])
+            # add a record of the index, initialised vector, p values, measurements
+            experiments.append(ExperimentRecord(i, init_vector, (p_list[0], p_list[1]), (measurements_1,),
+                                                expected_probabilities=expected_probabilities))
 
         return experiments
 
     @staticmethod
-    def verification_heuristic(property_idx, exp_idx, original_failing_circuit, output_distribution, input_state_list,
-                               extra_info=None, measurements=1000):
-        qlength, clength = get_circuit_register(original_failing_circuit)
+    def verification_circuit(failing_circuit, input_state_list, extra_info=None):
+        qlength, clength = get_circuit_register(failing_circuit)
         init_state = QuantumCircuit(qlength)
 
         # print(input_state_list)
 
         init_state.initialize(input_state_list, 0)
-        inputted_circuit_to_test = init_state.compose(list_to_circuit(original_failing_circuit))
+        inputted_circuit_to_test = init_state.compose(failing_circuit)
 
-        measurements_1 = measure_qubits(inputted_circuit_to_test, [0, 1], basis=['z'], measurements=measurements)
+        return inputted_circuit_to_test, [0, 1], ['z']
 
+    @staticmethod
+    def verification_p_values(measurements_1, output_distribution, extra_info=None):
         # print(measurements_1)
         # print(output_distribution)
 
         # not quite perfect here, should be checking all basis for the qubits, but only checking z
         p_value_0, p_value_1 = assert_equal_distributions(measurements_1, output_distribution, basis=['z'])
 
-        return [property_idx, exp_idx, (p_value_0, p_value_1)]
+        return p_value_0, p_value_1
@@ -1,16 +1,33 @@
 import random
 import time
+import uuid
 from abc import ABC, abstractmethod
 
-from dd_regression.dd_algorithm import list_minus, dd
+from dd_regression.dd_algorithm import list_minus, dd, make_executor
 from dd_regression.diff_algorithm import Removal, Addition, diff
 from dd_regression.helper_functions import add_random_chaff, list_to_circuit
+from dd_regression.property_based_oracle import clear_verification_cache
 
 
 class CaseStudyInterface(ABC):
-    test_cache = {}
     tests_performed = 0
     tests_performed_no_cache = 0
+    # set incremental_correction = True to let the oracle stop once the holm bonferroni outcome is decided
+    incremental_correction = False
+    # "thread", "process" or a concurrent.futures.Executor to execute the properties of each test concurrently
+    oracle_executor = None
+    # multiple testing correction of the oracle: "holm_bonferroni", "holm", "hochberg" or "benjamini_hochberg"
+    correction_method = "holm_bonferroni"
+    # set cache_verifications = True to measure the verification of a repeated input once per dd run
+    # (see verification_cache in dd_regression.property_based_oracle)
+    cache_verifications = False
+    # key of the verification measurements of the current dd run, set by analyse_results when caching
+    verification_cache_key = None
+    # how the oracle measures the circuits: "shots", "statevector" or "statevector_shots" (see measure_qubits_batch)
+    measurement_engine = "shots"
+    # with sequential_looks > 1 the shots of each input are measured in batches, and the properties stop measuring
+    # once the p-values are decisive (see sequential_test)
+    sequential_looks = 1
 
     @abstractmethod
     def get_algorithm_name(self):
@@ -46,7 +63,8 @@ class CaseStudyInterface(ABC):
         """
         pass
 
-    def analyse_results(self, chaff_length, inputs_to_generate, number_of_properties, number_of_measurements, significance_level, test_amount):
+    def analyse_results(self, chaff_length, inputs_to_generate, number_of_properties, number_of_measurements, significance_level, test_amount,
+                        executor=None, speculate=False):
         """
         -> in for loop
         -> generate random chaff and add it to the circuit
@@ -56,7 +74,17 @@ class CaseStudyInterface(ABC):
         -> if delete = compare position old
         -> if insert = first compare position old, then compare object by looking at prechaff circuit
          and postchaff circuit
+
+        executor ("thread", "process" or a concurrent.futures.Executor) is handed to dd to test configurations
+        concurrently (speculating on the next granularity if speculate is set). Tests are counted by dd, tests_performed
+        counts the outcomes used and tests_performed_no_cache the oracle runs.
         """
+        if isinstance(executor, str):
+            with make_executor(executor) as pool:
+                return self.analyse_results(chaff_length, inputs_to_generate, number_of_properties,
+                                            number_of_measurements, significance_level, test_amount, executor=pool,
+                                            speculate=speculate)
+
         log = False
         failing_circuit = self.failing_circuit()
         failing_circuit_list = [circuitIns for circuitIns in self.failing_circuit().data]
@@ -99,15 +127,21 @@ class CaseStudyInterface(ABC):
             # print(chaff_embedded_circuit_list)
             # print(fail_deltas)
 
+            counters = {"tests_called": 0, "tests_executed": 0}
+            # a new key for each run, so no worker reuses the verification measurements of a previous run
+            self.verification_cache_key = uuid.uuid4().hex if self.cache_verifications else None
             pass_diff, fail_diff = dd(pass_deltas, fail_deltas, self.test_function, passing_instructions, chaff_embedded_circuit_list,
                                       inputs_to_generate=inputs_to_generate, selected_properties=selected_properties,
                                       number_of_measurements=number_of_measurements,
-                                      significance_level=significance_level, logging=False)
+                                      significance_level=significance_level, logging=False, executor=executor,
+                                      speculate=speculate, counters=counters)
+            self.tests_performed += counters["tests_called"]
+            self.tests_performed_no_cache += counters["tests_executed"]
+            # the measurements of the finished run are not reused
+            clear_verification_cache()
 
             deltas = list_minus(fail_diff, pass_diff)
 
-            self.test_cache = {}
-
             deltas_found = 0
             indexes_found = []
             # need to check deltas to make sure they are the same after diffing with chaff
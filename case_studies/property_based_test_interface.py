@@ -3,34 +3,55 @@ from abc import ABC, abstractmethod
 
 # this class represents an individual property based test
 class PropertyBasedTestInterface(ABC):
+    # the amount of p-values each input produces (in property_based_test and verification_p_values), bounding the
+    # size of the family corrected by the oracle, None when unknown (disables incremental correction)
+    p_values_per_input = None
+    # set expected_to_fail = True when failures are expected, the oracle then fails on the inputs where no failure
+    # is observed
+    expected_to_fail = False
+
     # specifies a single property based test, what if input is the actual inputs?
     @staticmethod
     @abstractmethod
-    def property_based_test(circuit, inputs_to_generate=25, measurements=1000):
+    def property_based_test(circuit, inputs_to_generate=25, measurements=1000, engine="shots", looks=1):
         """
         inputs:
             circuit: The circuit to test
             inputs_to_generate: The amount of inputs to generate for each property based test
             measurements: The number of 'shots', measurements made of the circuit for each input generated
+            engine: How the circuits are measured (see measure_qubits_batch)
+            looks: The amount of batches the shots of each input are measured in (see sequential_test)
         outputs:
-            List of Quadruples in the form [(index, initialised state vector (input), p-values for all, measurements)]
+            List of ExperimentRecord (index, initialised state vector (input), p-values for all, measurements,
+            extra values required by the verification), the list form [index, input, p-values, measurements, extra
+            values...] is also accepted by the oracle
         """
 
-    # after we receive the ouptut state from the original property based test, we must compare it to the
-    # original failing circuit
+    # after we receive the output state from the original property based test, we must compare it to the
+    # original failing circuit: the oracle verifies the failed inputs of all the properties together, in a single
+    # backend job (see verify_experiments in dd_regression.property_based_oracle), each property provides the circuit
+    # to measure and the comparison of the measurements
     @staticmethod
     @abstractmethod
-    def verification_heuristic(property_index, experiment_index, original_failing_circuit, output_distribution,
-                               input_state_list, extra_info=None, measurements=1000):
+    def verification_circuit(failing_circuit, input_state_list, extra_info=None):
         """
         inputs:
-            original_failing_circuit: The original circuit that we have identified as failure-causing
-            output_distribution: A list of xyz measurement results on qubits
-            input_state_list: A list of inputs to run the circuit
-            measurements: The number of 'shots', measurements made of the circuit for each input generated
+            failing_circuit: The original failing circuit, as a QuantumCircuit (must not be modified)
+            input_state_list: The input of the failed experiment
+            extra_info: The extra values the property based test returned for the experiment, if any
+        outputs:
+            Triple of (circuit to measure, qubit register to measure, basis to measure)
+        """
+
+    @staticmethod
+    @abstractmethod
+    def verification_p_values(measurements_1, output_distribution, extra_info=None):
+        """
+        inputs:
+            measurements_1: The count array (see counts_array) of the verification circuit, shared with other
+                experiments when cached, so it must not be modified
+            output_distribution: The output distribution previously observed for the experiment
+            extra_info: The extra values the property based test returned for the experiment, if any
         outputs:
-            List of Quadruples in the form [(index, initialised state vector, p-values for all, measurements)]
-        description:
-            checks that the previously observed output distribution is equal to the output distribution observed
-            from the measurement or the originally failing circuit
+            p-values comparing the measurements to the previously observed output distribution
         """
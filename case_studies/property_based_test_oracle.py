@@ -0,0 +1,16 @@
+from case_studies.property_based_test_oracle_interface import PropertyBasedTestOracleInterface
+from dd_regression.property_based_oracle import property_based_oracle
+
+
+# this class is the property based test oracle shared by the case studies, each case study subclasses it
+# the pipeline itself is implemented by property_based_oracle
+class PropertyBasedTestOracle(PropertyBasedTestOracleInterface):
+    @staticmethod
+    def test_oracle(passing_circuit, failing_circuit, deltas, property_classes, measurements, significance_level,
+                    inputs_to_generate=25, verification=True, incremental=False, executor=None,
+                    correction_method="holm_bonferroni", verification_cache_key=None, engine="shots", looks=1):
+        return property_based_oracle(passing_circuit, failing_circuit, deltas, property_classes, measurements,
+                                     significance_level, inputs_to_generate=inputs_to_generate,
+                                     verification=verification, incremental=incremental,
+                                     executor=executor, correction_method=correction_method,
+                                     verification_cache_key=verification_cache_key, engine=engine, looks=looks)
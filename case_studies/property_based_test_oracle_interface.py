@@ -8,14 +8,25 @@ class PropertyBasedTestOracleInterface(ABC):
     # executes them, and returns a result from the composition (with statistical correction)
     @staticmethod
     @abstractmethod
-    def test_oracle(passing_circuit, failing_circuit, deltas, property_classes, measurements, significance_level, inputs_to_generate=25):
+    def test_oracle(passing_circuit, failing_circuit, deltas, property_classes, measurements, significance_level,
+                    inputs_to_generate=25, verification=True, incremental=False, executor=None,
+                    correction_method="holm_bonferroni", verification_cache_key=None, engine="shots", looks=1):
         """
         inputs:
             passing_circuit: The passing circuit
             failing_circuit: The failing circuit
             deltas: The deltas to apply to the passing circuit in order to get a merged combination
-            inputs_to_generate: The amount of inputs to generate for each property based test
+            property_classes: The property based tests to execute
             measurements: The number of 'shots', measurements made of the circuit for each input generated
+            significance_level: The family wise significance level of the corrections
+            inputs_to_generate: The amount of inputs to generate for each property based test
+            verification: Whether failures are verified against the failing circuit
+            incremental: Whether properties stop being executed once the outcome of the correction is decided
+            executor: None, "thread", "process" or a concurrent.futures.Executor to execute the properties on
+            correction_method: The multiple testing correction of the p-values (see multiple_testing)
+            verification_cache_key: A key unique to the dd run to reuse verification measurements within the run
+            engine: How the circuits are measured (see measure_qubits_batch)
+            looks: The amount of batches the shots of each input are measured in (see sequential_test)
         outputs:
             Pass, Fail, or Inconclusive
         description:
@@ -25,6 +36,9 @@ class PropertyBasedTestOracleInterface(ABC):
             - Failure causing inputs, and the test they failed with are recorded, and re-executed using the
             verification heuristic
             - holm bonferroni correction is applied again for the heuristic
+            - with incremental correction, properties stop being executed once failures are decided however the
+            p-values still to be produced turn out, verifying those inputs straight away (inconclusive once a
+            verification failure is decided)
             - if any state that originally failed is not equal return inconclusive
             - if all states that originally failed are equal return failure
             - if failures are originally detected return pass
@@ -0,0 +1,58 @@
+"""
+Multiple testing corrections over arrays of p-values, returning boolean masks of the rejected p-values
+(the inputs are neither copied nor modified).
+
+Methods:
+    - "holm_bonferroni": each sorted p-value p_(i) (from 0) is rejected when p_(i) <= alpha / (m - i), as the oracle
+    always corrected its p-values (holm bonferroni thresholds, without stopping at the first p-value accepted)
+    - "holm": Holm's step-down procedure, the p-values are rejected up to the first one above its threshold
+    - "hochberg": Hochberg's step-up procedure, the p-values are rejected up to the last one below its threshold
+    - "benjamini_hochberg": Benjamini-Hochberg step-up procedure with thresholds alpha * (i + 1) / m, controlling
+    the false discovery rate instead of the family wise error rate
+
+With pending p-values (still to be added to the family), the p-values rejected are the ones rejected however those
+turn out. For "holm" nothing is rejected then, a pending p-value could stop the procedure before any of them.
+"""
+import numpy as np
+
+correction_methods = ("holm_bonferroni", "holm", "hochberg", "benjamini_hochberg")
+
+
+def rejection_mask(p_values, family_wise_alpha, method="holm_bonferroni", pending=0):
+    """
+    Returns the boolean mask of the p-values rejected by the correction method at the family wise alpha
+    (false discovery rate for "benjamini_hochberg"), in the order of p_values.
+    """
+    if method not in correction_methods:
+        raise ValueError(f"Unrecognized correction method {method}, expected one of {correction_methods}")
+
+    p_values = np.asarray(p_values, dtype=float)
+    mask = np.zeros(len(p_values), dtype=bool)
+    if len(p_values) == 0 or (method == "holm" and pending > 0):
+        return mask
+
+    order = np.argsort(p_values, kind='stable')
+    ranks = np.arange(len(p_values))
+    family_size = len(p_values) + pending
+    if method == "benjamini_hochberg":
+        below = p_values[order] <= family_wise_alpha * (ranks + 1) / family_size
+    else:
+        below = p_values[order] <= family_wise_alpha / (family_size - ranks)
+
+    if method == "holm":
+        # step-down, rejected until the first p-value above its threshold
+        below = np.logical_and.accumulate(below)
+    elif method in ("hochberg", "benjamini_hochberg"):
+        # step-up, rejected up to the last p-value below its threshold
+        below = ranks <= (np.flatnonzero(below)[-1] if below.any() else -1)
+
+    mask[order] = below
+    return mask
+
+
+def rejected_indexes(property_indexes, experiment_indexes, mask):
+    """
+    Returns the set of (property index, experiment index) pairs of the rejected p-values, from the index arrays
+    parallel to the p-values and their rejection mask.
+    """
+    return set(zip(np.asarray(property_indexes)[mask].tolist(), np.asarray(experiment_indexes)[mask].tolist()))
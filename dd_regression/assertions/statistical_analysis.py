@@ -1,11 +1,43 @@
+import threading
 import warnings
+from collections import OrderedDict
+
 import numpy as np
 
 import scipy.stats as sci
-from qiskit import execute, Aer
+from scipy.special import gammaln
+from qiskit import transpile, Aer
 from qiskit.circuit import ClassicalRegister
+from qiskit.quantum_info import Statevector
+
+from dd_regression.assertions.multiple_testing import rejection_mask, rejected_indexes
+from dd_regression.helper_functions import circuit_fingerprint
 
 backend = Aer.get_backend('aer_simulator')
+supported_operations = set(backend.target.operation_names) | {"barrier"}
+
+rng = np.random.default_rng()
+
+# rotation applied before measuring in each basis, as in measure_x, measure_y and measure_z
+hadamard = np.array([[1, 1], [1, -1]]) / np.sqrt(2)
+basis_rotations = {'x': hadamard, 'y': hadamard @ np.diag([1, -1j]), 'z': None}
+# order of the counts of a qubit in count arrays (see counts_array)
+count_keys = ('x0', 'x1', 'y0', 'y1', 'z0', 'z1')
+
+# sequential testing of the inputs of properties (see sequential_test):
+# stop early when a p-value (corrected for the looks) is below this, overwhelmingly failing for any correction
+sequential_reject_p_value = 1e-6
+# stop early when the smallest p-value, corrected for the amount of p-values, is above this, clearly passing
+sequential_accept_p_value = 0.5
+
+# exact qubit probabilities of reference circuits, by fingerprint of the circuit and register
+reference_cache = OrderedDict()
+reference_cache_lock = threading.Lock()
+reference_cache_size = 256
+
+# log(k!) for k up to the largest total of a contingency table tested so far
+log_factorials = gammaln(np.arange(8001) + 1)
+log_factorials_lock = threading.Lock()
 
 warnings.simplefilter(action='ignore', category=FutureWarning)
 warnings.simplefilter(action='ignore', category=RuntimeWarning)
@@ -13,36 +45,11 @@ warnings.simplefilter(action='ignore', category=RuntimeWarning)
 
 # circuit 1 = tested circuit
 # circuit 2 = expected value
-def assert_equal(circuit_1, qubit_register_1, circuit_2, qubit_register_2, measurements=1000):
-    circuit_1.add_register(ClassicalRegister(1))
-    c1z = measure_z(circuit_1.copy(), [qubit_register_1])
-    c1x = measure_x(circuit_1.copy(), [qubit_register_1])
-    c1y = measure_y(circuit_1.copy(), [qubit_register_1])
-    z_counts_1 = execute(c1z, backend, shots=measurements, memory=True).result().get_counts()
-    x_counts_1 = execute(c1x, backend, shots=measurements, memory=True).result().get_counts()
-    y_counts_1 = execute(c1y, backend, shots=measurements, memory=True).result().get_counts()
-    z_cleaned_counts_1 = {"z" + k[-1]: v for (k, v) in z_counts_1.items()}
-    x_cleaned_counts_1 = {"x" + k[-1]: v for (k, v) in x_counts_1.items()}
-    y_cleaned_counts_1 = {"y" + k[-1]: v for (k, v) in y_counts_1.items()}
-    merged_counts_1 = z_cleaned_counts_1 | x_cleaned_counts_1 | y_cleaned_counts_1
-    for missing in [x for x in ["x0", "x1", "y0", "y1", "z0", "z1"] if x not in merged_counts_1.keys()]:
-        merged_counts_1[missing] = 0
-    merged_counts_1 = {i: merged_counts_1[i] for i in ["x0", "x1", "y0", "y1", "z0", "z1"]}
-
-    circuit_2.add_register(ClassicalRegister(1))
-    c2z = measure_z(circuit_2.copy(), [qubit_register_2])
-    c2x = measure_x(circuit_2.copy(), [qubit_register_2])
-    c2y = measure_y(circuit_2.copy(), [qubit_register_2])
-    z_counts_2 = execute(c2z, backend, shots=measurements, memory=True).result().get_counts()
-    x_counts_2 = execute(c2x, backend, shots=measurements, memory=True).result().get_counts()
-    y_counts_2 = execute(c2y, backend, shots=measurements, memory=True).result().get_counts()
-    z_cleaned_counts_2 = {"z" + k[-1]: v for (k, v) in z_counts_2.items()}
-    x_cleaned_counts_2 = {"x" + k[-1]: v for (k, v) in x_counts_2.items()}
-    y_cleaned_counts_2 = {"y" + k[-1]: v for (k, v) in y_counts_2.items()}
-    merged_counts_2 = z_cleaned_counts_2 | x_cleaned_counts_2 | y_cleaned_counts_2
-    for missing in [x for x in ["x0", "x1", "y0", "y1", "z0", "z1"] if x not in merged_counts_2.keys()]:
-        merged_counts_2[missing] = 0
-    merged_counts_2 = {i: merged_counts_2[i] for i in ["x0", "x1", "y0", "y1", "z0", "z1"]}
+def assert_equal(circuit_1, qubit_register_1, circuit_2, qubit_register_2, measurements=1000, engine="shots"):
+    # measure both circuits in one job
+    counts_1, counts_2 = measure_qubits_batch([circuit_1, circuit_2], [[qubit_register_1], [qubit_register_2]],
+                                              measurements=measurements, engine=engine)
+    merged_counts_1, merged_counts_2 = counts_dicts(counts_1)[0], counts_dicts(counts_2)[0]
 
     contingency_table_x = [[merged_counts_1.get(x, 0), merged_counts_2.get(x, 0)] for x in ["x0", "x1"]]
 
@@ -62,9 +69,8 @@ def assert_equal(circuit_1, qubit_register_1, circuit_2, qubit_register_2, measu
 
     # calculate the chi-squared test statistic
     # _, pvalue = sci.chisquare_gof(f_obs=list(merged_counts_1.values()), f_exp=list(merged_counts_2.values()))
-    _, p_value_x = sci.fisher_exact(contingency_table_x)
-    _, p_value_y = sci.fisher_exact(contingency_table_y)
-    _, p_value_z = sci.fisher_exact(contingency_table_z)
+    p_value_x, p_value_y, p_value_z = (float(p_value) for p_value in fisher_exact_batch(
+        [contingency_table_x, contingency_table_y, contingency_table_z]))
     # print(p_value_x)
     # print(p_value_y)
     # print(p_value_z)
@@ -73,23 +79,11 @@ def assert_equal(circuit_1, qubit_register_1, circuit_2, qubit_register_2, measu
 
 # circuit 1 = tested circuit
 # circuit 2 = expected value
-def assert_equal_state(circuit_1, qubit_register_1, merged_counts_2, measurements=1000):
+def assert_equal_state(circuit_1, qubit_register_1, merged_counts_2, measurements=1000, engine="shots"):
     # print("orig fail")
     # print(circuit_1.draw(vertical_compression='high', fold=300))
-    circuit_1.add_register(ClassicalRegister(1))
-    c1z = measure_z(circuit_1.copy(), [qubit_register_1])
-    c1x = measure_x(circuit_1.copy(), [qubit_register_1])
-    c1y = measure_y(circuit_1.copy(), [qubit_register_1])
-    z_counts_1 = execute(c1z, backend, shots=measurements, memory=True).result().get_counts()
-    x_counts_1 = execute(c1x, backend, shots=measurements, memory=True).result().get_counts()
-    y_counts_1 = execute(c1y, backend, shots=measurements, memory=True).result().get_counts()
-    z_cleaned_counts_1 = {"z" + k[-1]: v for (k, v) in z_counts_1.items()}
-    x_cleaned_counts_1 = {"x" + k[-1]: v for (k, v) in x_counts_1.items()}
-    y_cleaned_counts_1 = {"y" + k[-1]: v for (k, v) in y_counts_1.items()}
-    merged_counts_1 = z_cleaned_counts_1 | x_cleaned_counts_1 | y_cleaned_counts_1
-    for missing in [x for x in ["x0", "x1", "y0", "y1", "z0", "z1"] if x not in merged_counts_1.keys()]:
-        merged_counts_1[missing] = 0
-    merged_counts_1 = {i: merged_counts_1[i] for i in ["x0", "x1", "y0", "y1", "z0", "z1"]}
+    merged_counts_1 = counts_dicts(measure_qubits(circuit_1, [qubit_register_1], measurements=measurements,
+                                                  engine=engine))[0]
 
     contingency_table_x = [[merged_counts_1.get(x, 0), merged_counts_2.get(x, 0)] for x in ["x0", "x1"]]
 
@@ -105,58 +99,242 @@ def assert_equal_state(circuit_1, qubit_register_1, merged_counts_2, measurement
 
     # calculate the chi-squared test statistic
     # _, pvalue = sci.chisquare_gof(f_obs=list(merged_counts_1.values()), f_exp=list(merged_counts_2.values()))
-    _, p_value_x = sci.fisher_exact(contingency_table_x)
-    _, p_value_y = sci.fisher_exact(contingency_table_y)
-    _, p_value_z = sci.fisher_exact(contingency_table_z)
+    p_value_x, p_value_y, p_value_z = (float(p_value) for p_value in fisher_exact_batch(
+        [contingency_table_x, contingency_table_y, contingency_table_z]))
     # print(p_value_x)
     # print(p_value_y)
     # print(p_value_z)
     return p_value_x, p_value_y, p_value_z, merged_counts_1, merged_counts_2
 
 
-def measure_qubits(circuit_1, register, measurements=1000, basis=None):
+def sequential_test(measure, compare, measurements=1000, looks=1):
+    """
+    Measures and compares the measurements of a property input in up to looks batches of shots, for at most
+    measurements shots in total, stopping early once the p-values are decisive (see sequential_reject_p_value and
+    sequential_accept_p_value). 1 look measures all the shots at once.
+
+    measure(shots) returns a tuple of measurements (in the format of measure_qubits or assert_equal) of that amount of
+    shots, and compare(*measurements) returns the list of p-values of the measurements accumulated so far.
+    The p-values are multiplied by the amount of looks (bonferroni correction over the looks), so they stay valid for
+    holm_bonferroni_correction whenever testing stops.
+
+    Returns the p-values and the accumulated measurements.
+    """
+    accumulated = None
+    p_values = []
+    shots_taken = 0
+    for look in range(looks):
+        shots = measurements * (look + 1) // looks - shots_taken
+        if shots == 0:
+            continue
+        batch = measure(shots)
+        shots_taken += shots
+        if accumulated is None:
+            accumulated = tuple(batch)
+        else:
+            accumulated = tuple(add_measurements(total, new) for total, new in zip(accumulated, batch))
+        uncorrected = compare(*accumulated)
+        p_values = [min(1.0, p_value * looks) for p_value in uncorrected]
+        if len(uncorrected) > 0 and (min(p_values) <= sequential_reject_p_value or
+                                     min(uncorrected) * len(uncorrected) >= sequential_accept_p_value):
+            break
+    return p_values, accumulated
+
+
+def add_measurements(measurements_1, measurements_2):
+    """
+    Adds up two measurements of the same qubits, either count arrays, dictionaries of counts or lists of them.
+    """
+    if isinstance(measurements_1, np.ndarray):
+        return measurements_1 + measurements_2
+    if isinstance(measurements_1, dict):
+        return {k: measurements_1.get(k, 0) + measurements_2.get(k, 0) for k in measurements_1 | measurements_2}
+    return [add_measurements(counts_1, counts_2) for counts_1, counts_2 in zip(measurements_1, measurements_2)]
+
+
+def measure_qubits(circuit_1, register, measurements=1000, basis=None, engine="shots"):
     # receives a circuit to measure, and a list of qubit registers to measure
     # returns a list of measurements for respective qubits
+    return measure_qubits_batch([circuit_1], [register], measurements=measurements, basis=basis, engine=engine)[0]
+
+
+def measure_qubits_batch(circuits, registers, measurements=1000, basis=None, engine="shots", bases=None):
+    """
+    Measures each circuit on the qubits of its respective register (as measure_qubits does),
+    submitting the basis circuits of all the circuits to the backend as a single job.
+    bases (a basis list for each circuit) overrides basis. engine is how the measurements are obtained:
+    "shots" samples the basis measurement circuits on the simulator,
+    "statevector" computes the exact basis probabilities of each qubit from the statevector and draws the counts,
+    "statevector_shots" samples the shots of each basis from the statevector, with the basis rotations applied to it
+
+    Returns the per qubit counts of each circuit, as count arrays (see counts_array).
+    """
     if basis is None:
         basis = ['x', 'y', 'z']
+    if bases is None:
+        bases = [basis] * len(circuits)
+
+    if engine == "statevector":
+        results = []
+        for circuit, register, basis in zip(circuits, registers, bases):
+            circuit.add_register(ClassicalRegister(len(register)))
+            results.append(sample_qubit_counts(qubit_probabilities(circuit, register), measurements, basis))
+        return results
+    elif engine == "statevector_shots":
+        results = []
+        for circuit, register, basis in zip(circuits, registers, bases):
+            circuit.add_register(ClassicalRegister(len(register)))
+            results.append(sample_statevector_shots(circuit, register, measurements, basis))
+        return results
+    elif engine != "shots":
+        raise ValueError(f"Unrecognized measurement engine {engine}")
+
+    basis_circuits = []
+    for circuit, register, basis in zip(circuits, registers, bases):
+        circuit.add_register(ClassicalRegister(len(register)))
+        # transpiled once for all the basis, the basis rotations and measurements are natively supported
+        circuit = native_circuit(circuit)
+        if 'z' in basis:
+            basis_circuits.append(measure_z(circuit.copy(), register))
+        if 'x' in basis:
+            basis_circuits.append(measure_x(circuit.copy(), register))
+        if 'y' in basis:
+            basis_circuits.append(measure_y(circuit.copy(), register))
 
-    results = []
-    circuit_1.add_register(ClassicalRegister(len(register)))
-
-    if 'z' in basis:
-        c1z = measure_z(circuit_1.copy(), register)
-        z_counts_1 = execute(c1z, backend, shots=measurements, memory=True).result().get_counts()
+    counts = run_circuits(basis_circuits, measurements) if len(basis_circuits) > 0 else []
 
-    if 'x' in basis:
-        c1x = measure_x(circuit_1.copy(), register)
-        x_counts_1 = execute(c1x, backend, shots=measurements, memory=True).result().get_counts()
+    results = []
+    counts_idx = 0
+    for register, basis in zip(registers, bases):
+        basis_counts = {}
+        for b in ['z', 'x', 'y']:
+            if b in basis:
+                basis_counts[b] = counts[counts_idx]
+                counts_idx += 1
+        results.append(per_qubit_counts(basis_counts, len(register), measurements, basis))
+    return results
 
-    if 'y' in basis:
-        c1y = measure_y(circuit_1, register)
-        y_counts_1 = execute(c1y, backend, shots=measurements, memory=True).result().get_counts()
 
-    for i in range(len(register)):
-        res_dict = {}
+def run_circuits(circuits, measurements=1000):
+    """
+    Runs the circuits on the backend as a single job, returning the list of counts of each circuit.
+    """
+    circuits = [native_circuit(circuit) for circuit in circuits]
+    counts = backend.run(circuits, shots=measurements).result().get_counts()
+    # a single circuit job returns the counts dictionary itself
+    if len(circuits) == 1:
+        return [counts]
+    return counts
+
+
+def native_circuit(circuit):
+    """
+    Returns the circuit if the simulator supports all of its operations, otherwise the circuit transpiled for it.
+
+    Circuits are transpiled one by one (transpiling a list of circuits at once spreads it over a process pool,
+    which costs more than simulating them).
+    """
+    if all(instruction.operation.name in supported_operations for instruction in circuit.data):
+        return circuit
+    return transpile(circuit, backend)
+
+
+def reference_qubit_probabilities(circuit, register):
+    """
+    Returns qubit_probabilities of a reference circuit, cached (bounded, least recently used) on the fingerprint of
+    the circuit and the register.
+    """
+    key = (circuit_fingerprint(circuit), tuple(register))
+    with reference_cache_lock:
+        probabilities = reference_cache.get(key)
+        if probabilities is not None:
+            reference_cache.move_to_end(key)
+
+    if probabilities is None:
+        probabilities = qubit_probabilities(circuit, register)
+        with reference_cache_lock:
+            reference_cache[key] = probabilities
+            while len(reference_cache) > reference_cache_size:
+                reference_cache.popitem(last=False)
+    return probabilities.copy()
+
+
+def qubit_probabilities(circuit, register):
+    """
+    Returns the exact probabilities of measuring 1 in the x, y and z basis (after the rotations of measure_x,
+    measure_y and measure_z) for each qubit of the register, as an array of shape (len(register), 3),
+    computed from the statevector of the circuit.
+    """
+    state = Statevector(circuit).data
+    probabilities = np.empty((len(register), 3))
+    for i, qubit in enumerate(register):
+        # reduced density matrix of the qubit
+        amplitudes = state.reshape(2 ** (circuit.num_qubits - qubit - 1), 2, 2 ** qubit)
+        density = np.einsum('abc,adc->bd', amplitudes, amplitudes.conj())
+        probabilities[i] = ((1 - 2 * density[0, 1].real) / 2, (1 + 2 * density[0, 1].imag) / 2, density[1, 1].real)
+    return np.clip(probabilities, 0, 1)
+
+
+def sample_statevector_shots(circuit, register, measurements, basis):
+    """
+    Measures the qubits of the register (in the format of per_qubit_counts) by simulating the circuit once,
+    then for each basis rotating the qubits of the statevector and sampling the shots from its probabilities.
+    """
+    num_qubits = circuit.num_qubits
+    # axis num_qubits - 1 - q of the state tensor is qubit q
+    state = Statevector(circuit).data.reshape((2,) * num_qubits)
+    outcomes = np.arange(2 ** num_qubits)
+    results = np.zeros((len(register), len(count_keys)), dtype=np.int64)
+    for basis_idx, b in enumerate(['x', 'y', 'z']):
+        if b not in basis:
+            continue
+        rotated = state
+        if basis_rotations[b] is not None:
+            for qubit in register:
+                axis = num_qubits - 1 - qubit
+                rotated = np.moveaxis(np.tensordot(basis_rotations[b], rotated, axes=([1], [axis])), 0, axis)
+        probabilities = np.abs(rotated.reshape(-1)) ** 2
+        shots = rng.multinomial(measurements, probabilities / probabilities.sum())
+        ones = [shots[(outcomes >> qubit) & 1 == 1].sum() for qubit in register]
+        results[:, 2 * basis_idx] = measurements - np.array(ones, dtype=np.int64)
+        results[:, 2 * basis_idx + 1] = ones
+    return results
 
-        if 'x' in basis:
-            x1 = sum([v for (k, v) in x_counts_1.items() if k[-(i + 1)] == '1'])
-            x0 = measurements - x1
-            res_dict["x0"] = x0
-            res_dict["x1"] = x1
 
-        if 'y' in basis:
-            y1 = sum([v for (k, v) in y_counts_1.items() if k[-(i + 1)] == '1'])
-            y0 = measurements - y1
-            res_dict["y0"] = y0
-            res_dict["y1"] = y1
+def sample_qubit_counts(probabilities, measurements, basis):
+    """
+    Draws the per qubit counts (in the format of per_qubit_counts) of measuring each qubit, measurements times
+    in each basis, from the probabilities given by qubit_probabilities.
+    """
+    ones = rng.binomial(measurements, probabilities)
+    results = np.zeros((len(ones), len(count_keys)), dtype=np.int64)
+    for basis_idx, b in enumerate(['x', 'y', 'z']):
+        if b in basis:
+            results[:, 2 * basis_idx] = measurements - ones[:, basis_idx]
+            results[:, 2 * basis_idx + 1] = ones[:, basis_idx]
+    return results
 
-        if 'z' in basis:
-            z1 = sum([v for (k, v) in z_counts_1.items() if k[-(i + 1)] == '1'])
-            z0 = measurements - z1
-            res_dict["z0"] = z0
-            res_dict["z1"] = z1
 
-        results.append(res_dict)
+def per_qubit_counts(basis_counts, qubit_amount, measurements, basis):
+    """
+    Reduces the counts of each basis measurement circuit to the count array (see counts_array) of the measured
+    qubits, the counts of the bases not measured are 0.
+
+    The bitstrings of the counts are converted once to a matrix of bits (column i is clbit i) and the counts of 1
+    for all the qubits are computed together, weighting the bits by the counts.
+    """
+    results = np.zeros((qubit_amount, len(count_keys)), dtype=np.int64)
+    for basis_idx, b in enumerate(['x', 'y', 'z']):
+        if b in basis:
+            counts = basis_counts[b]
+            characters = np.array(list(counts), dtype=bytes)
+            characters = characters.view(np.uint8).reshape(len(counts), -1)
+            # registers are separated by spaces in the bitstrings, clbit 0 is the last character
+            bits = characters[:, characters[0] != ord(" ")][:, ::-1][:, :qubit_amount] == ord("1")
+            weights = np.fromiter(counts.values(), dtype=np.int64, count=len(counts))
+            ones = weights @ bits
+            results[:, 2 * basis_idx] = measurements - ones
+            results[:, 2 * basis_idx + 1] = ones
     return results
 
 
@@ -169,26 +347,133 @@ def assert_equal_distributions(distribution_list_1, distribution_list_2, basis=N
     if basis is None:
         basis = ['x', 'y', 'z']
 
-    assert len(distribution_list_1) == len(distribution_list_2)
+    # lists of per qubit measurements, or their count arrays
+    counts_1 = counts_array(distribution_list_1)
+    counts_2 = counts_array(distribution_list_2)
 
-    p_vals = []
+    assert len(counts_1) == len(counts_2)
 
-    for i, dist_1 in enumerate(distribution_list_1):
-        if 'x' in basis:
-            contingency_table_x = [[dist_1.get(x, 0), distribution_list_2[i].get(x, 0)] for x in ["x0", "x1"]]
-            _, p_value_x = sci.fisher_exact(contingency_table_x)
-            p_vals.append(p_value_x)
+    basis_indexes = [basis_idx for basis_idx, b in enumerate(['x', 'y', 'z']) if b in basis]
+    if len(counts_1) == 0 or len(basis_indexes) == 0:
+        return []
 
-        if 'y' in basis:
-            contingency_table_y = [[dist_1.get(x, 0), distribution_list_2[i].get(x, 0)] for x in ["y0", "y1"]]
-            _, p_value_y = sci.fisher_exact(contingency_table_y)
-            p_vals.append(p_value_y)
+    # table [[b0 of 1, b0 of 2], [b1 of 1, b1 of 2]] for each qubit and basis, in that order
+    contingency_tables = np.stack([counts_1.reshape(-1, 3, 2), counts_2.reshape(-1, 3, 2)], axis=-1)[:, basis_indexes]
+    return [float(p_value) for p_value in fisher_exact_batch(contingency_tables)]
 
-        if 'z' in basis:
-            contingency_table_z = [[dist_1.get(x, 0), distribution_list_2[i].get(x, 0)] for x in ["z0", "z1"]]
-            _, p_value_z = sci.fisher_exact(contingency_table_z)
-            p_vals.append(p_value_z)
-    return p_vals
+
+# compare a set of output distributions to the exact probabilities of measuring 1 on each qubit, in the order
+# of qubit_probabilities, i.e. [dist_q1, dist_q2] and [[p_x_q1, p_y_q1, p_z_q1], [p_x_q2, p_y_q2, p_z_q2]]
+def assert_distributions_match_probabilities(distribution_list, probability_list, basis=None):
+    """
+    One sample goodness of fit version of assert_equal_distributions, the p-values (in the same order) of exact
+    binomial tests of the counts of each qubit in each basis against the expected probabilities.
+    """
+    if basis is None:
+        basis = ['x', 'y', 'z']
+
+    counts = counts_array(distribution_list).reshape(-1, 3, 2)
+
+    assert len(counts) == len(probability_list)
+
+    basis_indexes = [basis_idx for basis_idx, b in enumerate(['x', 'y', 'z']) if b in basis]
+    if len(counts) == 0 or len(basis_indexes) == 0:
+        return []
+
+    counts = counts[:, basis_indexes]
+    probabilities = np.asarray(probability_list, dtype=float).reshape(-1, 3)[:, basis_indexes]
+    return [float(p_value) for p_value in binomial_test_batch(counts[..., 1].ravel(), counts.sum(axis=-1).ravel(),
+                                                                probabilities.ravel())]
+
+
+def counts_array(distribution_list):
+    """
+    Returns the counts of a list of per qubit measurements (dictionaries of counts), or of a single one, as an array
+    of shape (qubits, 6) in the order of count_keys, as returned by measure_qubits. Count arrays are returned unchanged.
+    """
+    if isinstance(distribution_list, np.ndarray):
+        return distribution_list
+    if isinstance(distribution_list, dict):
+        distribution_list = [distribution_list]
+    return np.array([[dist.get(key, 0) for key in count_keys] for dist in distribution_list],
+                    dtype=np.int64).reshape(-1, len(count_keys))
+
+
+def counts_dicts(counts, basis=None):
+    """
+    Returns the count array (see counts_array) as a list of per qubit dictionaries of counts, with the keys of the
+    measured basis, for callers expecting dictionaries.
+    """
+    if basis is None:
+        basis = ['x', 'y', 'z']
+    keys = [(key_idx, key) for key_idx, key in enumerate(count_keys) if key[0] in basis]
+    return [{key: int(qubit_counts[key_idx]) for key_idx, key in keys} for qubit_counts in counts_array(counts)]
+
+
+def binomial_test_batch(successes, trials, probabilities):
+    """
+    Two-sided exact binomial test of each count of successes out of its trials against its probability
+    (as scipy.stats.binomtest does for a single count), returning all the p-values at once.
+    The p-value is the sum of the probabilities of the counts no more likely than the observed one.
+    """
+    successes = np.asarray(successes, dtype=np.int64)
+    trials = np.asarray(trials, dtype=np.int64)
+    probabilities = np.asarray(probabilities, dtype=float)
+
+    # probabilities of every count (zero above the amount of trials)
+    pmf = sci.binom.pmf(np.arange(trials.max() + 1), trials[:, None], probabilities[:, None])
+    observed = sci.binom.pmf(successes, trials, probabilities)
+    # relative tolerance for probabilities equal to the observed one (up to rounding)
+    as_extreme = pmf <= observed[:, None] * (1 + 1e-7)
+    return np.minimum(np.where(as_extreme, pmf, 0).sum(axis=1), 1.0)
+
+
+def fisher_exact_batch(contingency_tables):
+    """
+    Two-sided Fisher's exact test of each 2x2 table of an (N, 2, 2) array, returning the N p-values at once
+    (as scipy.stats.fisher_exact does for a single table).
+
+    The hypergeometric probabilities of every possible top left value of all the tables are computed together from
+    a cached table of log factorials, the p-value is the sum of the probabilities no larger than the observed one.
+    """
+    global log_factorials
+    tables = np.asarray(contingency_tables, dtype=np.int64).reshape(-1, 2, 2)
+    top_left = tables[:, 0, 0]
+    row_1 = tables[:, 0, 0] + tables[:, 0, 1]
+    row_2 = tables[:, 1, 0] + tables[:, 1, 1]
+    column_1 = tables[:, 0, 0] + tables[:, 1, 0]
+    total = row_1 + row_2
+
+    factorials = log_factorials
+    if total.max() >= len(factorials):
+        # the table is grown by one call at a time, concurrent calls reuse the table grown by another
+        with log_factorials_lock:
+            if total.max() >= len(log_factorials):
+                log_factorials = gammaln(np.arange(2 * total.max() + 1) + 1)
+            factorials = log_factorials
+
+    def log_binomial(n, k):
+        return factorials[n] - factorials[k] - factorials[n - k]
+
+    # possible top left values given the margins, over a common range for all the tables
+    lowest = np.maximum(0, column_1 - row_2)
+    highest = np.minimum(column_1, row_1)
+    values = np.arange(lowest.min(), highest.max() + 1)
+    in_support = (values >= lowest[:, None]) & (values <= highest[:, None])
+    values = np.clip(values, lowest[:, None], highest[:, None])
+
+    log_pmf = (log_binomial(row_1[:, None], values) + log_binomial(row_2[:, None], column_1[:, None] - values)
+               - log_binomial(total, column_1)[:, None])
+    log_observed = (log_binomial(row_1, top_left) + log_binomial(row_2, column_1 - top_left)
+                    - log_binomial(total, column_1))
+    # relative tolerance for probabilities equal to the observed one (up to rounding)
+    as_extreme = in_support & (log_pmf <= log_observed[:, None] + 1e-7)
+    p_values = np.minimum(np.where(as_extreme, np.exp(log_pmf), 0).sum(axis=1), 1.0)
+
+    # if both values in a row or column are zero, the p-value is 1
+    empty_margin = (row_1 == 0) | (row_2 == 0) | (column_1 == 0) | (column_1 == total)
+    p_values[empty_margin] = 1.0
+    return p_values
 
 
 # compare 2 sets of output distributions, the order of the list of distributions must be the same for both
@@ -200,6 +485,10 @@ def assert_equal_distributions_chi(distribution_list_1, distribution_list_2, bas
     if basis is None:
         basis = ['x', 'y', 'z']
 
+    # dictionaries of the per qubit counts, of count arrays as well
+    distribution_list_1 = counts_dicts(distribution_list_1)
+    distribution_list_2 = counts_dicts(distribution_list_2)
+
     assert len(distribution_list_1) == len(distribution_list_2)
 
     contingency_table_row1 = []
@@ -270,15 +559,14 @@ def measure_x(circuit, qubit_indexes):
 
 
 # make this return a list of failures p_value, index pairs
-def holm_bonferroni_correction(exp_pairs, family_wise_alpha):
-    # print(exp_pairs)
-
-    failing_indexes = set()
-    exp_pairs.sort(key=lambda x: x[2])
-    for i in range(len(exp_pairs)):
-        if exp_pairs[i][2] <= (family_wise_alpha / (len(exp_pairs) - i)):
-            failing_indexes.add((exp_pairs[i][0], exp_pairs[i][1]))
-
-    # print("failing indexes")
-    # print(failing_indexes)
-    return failing_indexes
+def holm_bonferroni_correction(exp_pairs, family_wise_alpha, pending_pairs=0, method="holm_bonferroni"):
+    # exp_pairs is a list of (property index, experiment index, p-value) tuples, or a structured array of them,
+    # it is not modified. pending_pairs is the amount of p-values still to be added to the family, the failing
+    # indexes returned then stay failing however those p-values turn out (see multiple_testing for the methods)
+    if isinstance(exp_pairs, np.ndarray):
+        property_indexes, experiment_indexes, p_values = (exp_pairs[name] for name in exp_pairs.dtype.names)
+    else:
+        property_indexes, experiment_indexes, p_values = (np.array([pair[k] for pair in exp_pairs]) for k in range(3))
+
+    mask = rejection_mask(p_values, family_wise_alpha, method=method, pending=pending_pairs)
+    return rejected_indexes(property_indexes, experiment_indexes, mask)
@@ -1,136 +1,254 @@
 """
    Adapted from https://www.debuggingbook.org/html/DeltaDebugger.html#General-Delta-Debugging
 """
-from dd_regression.helper_functions import order_list_by_another_list
+import multiprocessing
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, ProcessPoolExecutor
+
 from dd_regression.result_classes import Passed, Failed
 
 
 def dd(c_pass, c_fail, test, source_pass, source_fail, inputs_to_generate, selected_properties, number_of_measurements,
-       significance_level, logging=False):
+       significance_level, logging=False, executor=None, max_workers=None, speculate=False, counters=None):
     """Return a pair (C_PASS’, C_FAIL’) such that
         * C_PASS subseteq C_PASS’ subset C_FAIL’ subseteq C_FAIL holds
-        * C_FAIL’ - C_PASS’ is a minimal difference relevant for TEST."""
+        * C_FAIL’ - C_PASS’ is a minimal difference relevant for TEST.
+
+    If an executor is given ("thread", "process" or a concurrent.futures.Executor), all subsets and complements
+    of the current granularity are tested concurrently, the first reduction in offset order is still the one taken.
+    With speculate=True the candidates of the next granularity (2n) are scheduled behind the current ones, so the
+    workers stay busy when no reduction is found, outcomes of finished speculative tests are kept for reuse.
+
+    If a counters dict is given, its "tests_called" entry is incremented for each outcome dd uses, and its
+    "tests_executed" entry for each test run (in this process or on the executor, tests cancelled before they
+    started are not counted). Tests are counted here, as tests run in other threads or processes cannot update
+    shared counters safely."""
+    if isinstance(executor, str):
+        # executors created here are shut down (and their pending tests cancelled) once dd returns
+        with make_executor(executor, max_workers=max_workers) as pool:
+            return dd(c_pass, c_fail, test, source_pass, source_fail, inputs_to_generate, selected_properties,
+                      number_of_measurements, significance_level, logging=logging, executor=pool,
+                      speculate=speculate, counters=counters)
+
     n = 2  # Initial granularity
     offset = 0
-    # try:
-    if logging:
-        print("run passing circumstances test")
-        print(f"c_pass {c_pass}")
-    if not isinstance(test(c_pass, source_pass, source_fail, inputs_to_generate=inputs_to_generate,
-                           selected_properties=selected_properties,
-                           number_of_measurements=number_of_measurements, significance_level=significance_level),
-                      Passed): return [], []
-
-    if logging:
-        print("test failing circumstances test")
-        print(f"c_fail {c_fail}")
-    if not isinstance(test(c_fail, source_pass, source_fail, inputs_to_generate=inputs_to_generate,
-                           selected_properties=selected_properties,
-                           number_of_measurements=number_of_measurements, significance_level=significance_level),
-                      Failed): return [], []
-
-    while True:
-        if logging:
-            print(f"in dd loop")
-        delta = list_minus(c_fail, c_pass)
+    # outcomes (or futures of outcomes) of the tests of this run, keyed by configuration
+    outcomes = {}
+    # configurations are handled as bitmasks over the positions of the deltas in the original c_fail,
+    # they are only converted back to lists of deltas to call the test, and to return
+    index = DeltaIndex(c_fail)
+    c_pass = index.mask_of(c_pass)
+    c_fail = index.mask_of(c_fail)
 
-        if n > len(delta):
-            if logging:
-                print(f"n ({n}) < delta length ({delta})")
-            return c_pass, c_fail  # No further minimizing
+    def count(counter, amount=1):
+        if counters is not None:
+            counters[counter] = counters.get(counter, 0) + amount
+
+    def submit_tests(configurations):
+        """Schedule the test of each configuration on the executor, keyed by the configuration."""
+        for configuration in configurations:
+            if configuration not in outcomes:
+                outcomes[configuration] = executor.submit(test, index.deltas_of(configuration), source_pass,
+                                                          source_fail, inputs_to_generate=inputs_to_generate,
+                                                          selected_properties=selected_properties,
+                                                          number_of_measurements=number_of_measurements,
+                                                          significance_level=significance_level)
+                count("tests_executed")
 
-        deltas = split(delta, n)
-        # print(deltas)
+    def cancel_tests(keep=()):
+        """Cancel the tests that have not started yet, except for the configurations to keep.
+        Finished tests stay cached for the rest of the run, running tests are only kept when speculating."""
+        for configuration, outcome in list(outcomes.items()):
+            if configuration in keep or not isinstance(outcome, Future):
+                continue
+            if outcome.cancel():
+                count("tests_executed", -1)
+                del outcomes[configuration]
+            elif not (speculate or outcome.done()):
+                del outcomes[configuration]
 
-        reduction_found = False
-        j = 0
-        # offset = 0
-        while j < n:
-            i = (j + offset) % n
-            next_c_pass = order_list_by_another_list(list_union(c_pass, deltas[i]), c_fail, logging=False)
-            next_c_fail = order_list_by_another_list(list_minus(c_fail, deltas[i]), c_fail, logging=False)
+    def run_test(configuration):
+        """Return the outcome of the test, from the executor when it was scheduled on it."""
+        count("tests_called")
+        outcome = outcomes.get(configuration)
+        if outcome is None:
+            count("tests_executed")
+            outcome = test(index.deltas_of(configuration), source_pass, source_fail,
+                           inputs_to_generate=inputs_to_generate, selected_properties=selected_properties,
+                           number_of_measurements=number_of_measurements, significance_level=significance_level)
+            outcomes[configuration] = outcome
+        if isinstance(outcome, Future):
+            return outcome.result()
+        return outcome
 
+    try:
+        if executor is not None:
+            submit_tests([c_pass, c_fail])
+            if speculate and count_deltas(c_fail & ~c_pass) >= n:
+                submit_tests(flatten_candidates(granularity_candidates(c_pass, c_fail, n, offset)))
+
+        if logging:
+            print("run passing circumstances test")
+            print(f"c_pass {index.deltas_of(c_pass)}")
+        if not isinstance(run_test(c_pass), Passed):
+            return [], []
+
+        if logging:
+            print("test failing circumstances test")
+            print(f"c_fail {index.deltas_of(c_fail)}")
+        if not isinstance(run_test(c_fail), Failed):
+            return [], []
+
+        while True:
             if logging:
-                print(f"delta i = {i}")
-                print(deltas[i])
-                print("passing deltas to test:")
-                print(next_c_pass)
-                print("failing deltas to test:")
-                print(next_c_fail)
-
-            # if isinstance(test(next_c_pass, source_pass, source_fail, inputs_to_generate=inputs_to_generate,
-            #                    selected_properties=selected_properties,
-            #                    number_of_measurements=number_of_measurements, significance_level=significance_level),
-            #               Failed) and n == 2:
-            if isinstance(test(next_c_pass, source_pass, source_fail, inputs_to_generate=inputs_to_generate,
-                                   selected_properties=selected_properties,
-                                   number_of_measurements=number_of_measurements,
-                                   significance_level=significance_level),
-                              Failed):
-                if logging:
-                    print("Reduce to subset")
-                    print("Pass test failed")
-                c_fail = next_c_pass
-                offset = i
-                reduction_found = True
-                break
-
-            # elif isinstance(test(next_c_fail, source_pass, source_fail, inputs_to_generate=inputs_to_generate,
-            #                      selected_properties=selected_properties,
-            #                      number_of_measurements=number_of_measurements, significance_level=significance_level),
-            #                 Passed) and n == 2:
-            elif isinstance(test(next_c_fail, source_pass, source_fail, inputs_to_generate=inputs_to_generate,
-                                     selected_properties=selected_properties,
-                                     number_of_measurements=number_of_measurements,
-                                     significance_level=significance_level),
-                                Passed):
+                print(f"in dd loop")
+            delta = c_fail & ~c_pass
+
+            if n > count_deltas(delta):
                 if logging:
-                    print("Increase to subset")
-                    print("Fail Test Passed")
-                c_pass = next_c_fail
-                offset = i  # was offset = 0 in original dd()
-                reduction_found = True
-                break
-            elif isinstance(test(next_c_fail, source_pass, source_fail, inputs_to_generate=inputs_to_generate,
-                                 selected_properties=selected_properties,
-                                 number_of_measurements=number_of_measurements, significance_level=significance_level),
-                            Failed):
+                    print(f"n ({n}) < delta length ({index.deltas_of(delta)})")
+                return index.deltas_of(c_pass), index.deltas_of(c_fail)  # No further minimizing
+
+            deltas = split_mask(delta, n)
+            # print(deltas)
+
+            # subsets and complements in the order they are tested, starting from the last reduction
+            candidates = granularity_candidates(c_pass, c_fail, n, offset)
+
+            if executor is not None:
+                configurations = flatten_candidates(candidates)
+                if speculate and n < count_deltas(delta):
+                    # look ahead: the next granularity is tested if this one is unresolved
+                    configurations += flatten_candidates(
+                        granularity_candidates(c_pass, c_fail, min(n * 2, count_deltas(delta)), offset))
+                submit_tests(configurations)
+                cancel_tests(keep=set(configurations))
+
+            reduction_found = False
+            j = 0
+            # offset = 0
+            while j < n:
+                i, next_c_pass, next_c_fail = candidates[j]
+
                 if logging:
-                    print("Reduce to complement")
-                    print("Fail test Failed")
-                c_fail = next_c_fail
-                n = max(n - 1, 2)
-                offset = i
-                reduction_found = True
-                break
-            elif isinstance(test(next_c_pass, source_pass, source_fail, inputs_to_generate=inputs_to_generate,
-                                 selected_properties=selected_properties,
-                                 number_of_measurements=number_of_measurements, significance_level=significance_level),
-                            Passed):
+                    print(f"delta i = {i}")
+                    print(index.deltas_of(deltas[i]))
+                    print("passing deltas to test:")
+                    print(index.deltas_of(next_c_pass))
+                    print("failing deltas to test:")
+                    print(index.deltas_of(next_c_fail))
+
+                # each candidate is tested at most once, the complement only if the subset did not fail
+                pass_outcome = run_test(next_c_pass)
+                fail_outcome = run_test(next_c_fail) if not isinstance(pass_outcome, Failed) else None
+
+                # if isinstance(test(next_c_pass, source_pass, source_fail, inputs_to_generate=inputs_to_generate,
+                #                    selected_properties=selected_properties,
+                #                    number_of_measurements=number_of_measurements, significance_level=significance_level),
+                #               Failed) and n == 2:
+                if isinstance(pass_outcome, Failed):
+                    if logging:
+                        print("Reduce to subset")
+                        print("Pass test failed")
+                    c_fail = next_c_pass
+                    offset = i
+                    reduction_found = True
+                    break
+
+                # elif isinstance(test(next_c_fail, source_pass, source_fail, inputs_to_generate=inputs_to_generate,
+                #                      selected_properties=selected_properties,
+                #                      number_of_measurements=number_of_measurements, significance_level=significance_level),
+                #                 Passed) and n == 2:
+                elif isinstance(fail_outcome, Passed):
+                    if logging:
+                        print("Increase to subset")
+                        print("Fail Test Passed")
+                    c_pass = next_c_fail
+                    offset = i  # was offset = 0 in original dd()
+                    reduction_found = True
+                    break
+                elif isinstance(fail_outcome, Failed):
+                    if logging:
+                        print("Reduce to complement")
+                        print("Fail test Failed")
+                    c_fail = next_c_fail
+                    n = max(n - 1, 2)
+                    offset = i
+                    reduction_found = True
+                    break
+                elif isinstance(pass_outcome, Passed):
+                    if logging:
+                        print("Increase to complement")
+                        print("Pass test passed")
+                    c_pass = next_c_pass
+                    n = max(n - 1, 2)
+                    offset = i
+                    reduction_found = True
+                    break
+                else:
+                    if logging:
+                        print(f"all inconclusive j {j}, n {n}")
+                    j = j + 1  # Try next subset
+
+            if not speculate:
+                cancel_tests()
+
+            if not reduction_found:  # All tests unresolved
                 if logging:
-                    print("Increase to complement")
-                    print("Pass test passed")
-                c_pass = next_c_pass
-                n = max(n - 1, 2)
-                offset = i
-                reduction_found = True
-                break
-            else:
+                    print("No reduction found")
+                    print("All tests unresolved")
+
+                if n >= count_deltas(delta):
+                    return index.deltas_of(c_pass), index.deltas_of(c_fail)
+
                 if logging:
-                    print(f"all inconclusive j {j}, n {n}")
-                j = j + 1  # Try next subset
+                    print(f"Increase granularity to {min(n * 2, count_deltas(delta))}")
+                n = min(n * 2, count_deltas(delta))
+    finally:
+        # pending tests are not needed once dd returns
+        cancel_tests()
 
-        if not reduction_found:  # All tests unresolved
-            if logging:
-                print("No reduction found")
-                print("All tests unresolved")
 
-            if n >= len(delta):
-                return c_pass, c_fail
+def granularity_candidates(c_pass, c_fail, n, offset):
+    """
+    Return the (i, next_c_pass, next_c_fail) triples dd() tests at granularity n, where next_c_pass adds the i-th
+    split of the difference between c_fail and c_pass to c_pass, and next_c_fail removes it from c_fail.
+    Configurations are bitmasks (see DeltaIndex), triples are in the order they are tested, starting from the offset.
+    """
+    deltas = split_mask(c_fail & ~c_pass, n)
+    candidates = []
+    for j in range(n):
+        i = (j + offset) % n
+        candidates.append((i, c_pass | deltas[i], c_fail & ~deltas[i]))
+    return candidates
 
-            if logging:
-                print(f"Increase granularity to {min(n * 2, len(delta))}")
-            n = min(n * 2, len(delta))
+
+def flatten_candidates(candidates):
+    """Return the configurations of granularity_candidates, the subset before the complement of each split."""
+    return [configuration for _, next_c_pass, next_c_fail in candidates for configuration in (next_c_pass, next_c_fail)]
+
+
+def make_executor(executor, max_workers=None):
+    """
+    Create the executor used by dd() to test configurations concurrently.
+
+    Args:
+        executor: "thread" for a thread pool, "process" for a process pool (the test function and its arguments
+            must then be picklable), or an existing concurrent.futures.Executor which is returned unchanged.
+            Process pools start their workers from a fork server where available, processes forked from a
+            process that already ran the simulator deadlock (its thread pools do not survive the fork)
+        max_workers: The number of workers of a created pool (defaults to the number of cpus)
+    Returns:
+        A concurrent.futures.Executor
+    """
+    if isinstance(executor, Executor):
+        return executor
+    if executor == "thread":
+        return ThreadPoolExecutor(max_workers=max_workers)
+    if executor == "process":
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("forkserver"))
+        return ProcessPoolExecutor(max_workers=max_workers)
+    raise ValueError(f"Unrecognized executor {executor}, expected 'thread', 'process' or an Executor")
 
 
 def split(elements, n: int):
@@ -156,23 +274,70 @@ def split(elements, n: int):
     return subsets
 
 
+class DeltaIndex:
+    """
+    Indexes the (unique) deltas of an original configuration by their position in it.
+
+    Configurations derived from the original are represented as integer bitmasks, where bit i is set if the i-th
+    delta of the original is in the configuration, so minus (c1 & ~c2), union (c1 | c2) and hashing are cheap,
+    and converting a bitmask back to deltas restores the order of the original configuration
+    (application of deltas expects ordered deltas).
+    """
+
+    def __init__(self, deltas):
+        self.deltas = list(deltas)
+        self.positions = {delta: position for position, delta in enumerate(self.deltas)}
+
+    def mask_of(self, configuration):
+        """Return the bitmask of the deltas in the configuration."""
+        mask = 0
+        for delta in configuration:
+            mask |= 1 << self.positions[delta]
+        return mask
+
+    def deltas_of(self, mask):
+        """Return the deltas set in the bitmask, in the order of the original configuration."""
+        return [self.deltas[position] for position in mask_positions(mask)]
+
+
+def mask_positions(mask):
+    """Return the positions of the set bits of a bitmask, in increasing order."""
+    positions = []
+    while mask:
+        lowest_bit = mask & -mask
+        positions.append(lowest_bit.bit_length() - 1)
+        mask ^= lowest_bit
+    return positions
+
+
+def count_deltas(mask):
+    """Return the number of deltas in a bitmask configuration."""
+    return bin(mask).count("1")
+
+
+def split_mask(mask, n: int):
+    """
+    split a bitmask configuration into n (roughly equally sized) bitmasks, as split() does for lists
+    """
+    subsets = []
+    for positions in split(mask_positions(mask), n):
+        subset = 0
+        for position in positions:
+            subset |= 1 << position
+        subsets.append(subset)
+    return subsets
+
+
 def list_minus(c1, c2):
     """Return all elements of C1 that are not in C2.
-    Assumes elements of C1 are hashable."""
-    diffs = []
-    for elem in c1:
-        found = False
-        for elem2 in c2:
-            if elem == elem2:
-                found = True
-        if not found:
-            diffs.append(elem)
-    return diffs
+    Assumes elements of C2 are hashable."""
+    c2_set = set(c2)
+    return [elem for elem in c1 if elem not in c2_set]
 
 
 def list_union(c1, c2):
     """Return the union of C1 and C2.
-    Assumes elements of C1 are hashable."""
+    Assumes elements of C2 are hashable."""
     # The hash map S1 has an entry for each element in C1
     diffs = list_minus(c1, c2)
     return diffs + c2
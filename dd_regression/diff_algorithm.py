@@ -2,6 +2,9 @@
 Diffing code (complute_lcs_len and diff) from:
 https://florian.github.io/diffing/
 
+Myers diff (myers_diff) adapted from:
+https://blog.jcoglan.com/2017/02/12/the-myers-diff-algorithm-part-1/
+
 Application of deltas (Apply diffs) code modified from:
 https://blog.robertelder.org/diff-algorithm/
 
@@ -12,7 +15,7 @@ from dataclasses import dataclass
 
 from qiskit.circuit import CircuitInstruction
 
-from dd_regression.helper_functions import list_to_circuit
+from dd_regression.helper_functions import list_to_circuit, instruction_fingerprint
 
 
 @dataclass(eq=True, frozen=True)
@@ -56,6 +59,73 @@ class Removal:
         return f"Rem({self.location_index})"
 
 
+def intern_instructions(*lists):
+    """
+    Interns the elements of the lists (typically lists of circuit instructions) into small integer tokens,
+    equal elements get the same token.
+
+    Elements are bucketed by instruction_fingerprint without parameters (parameters are compared with a tolerance by
+    __eq__, so rounding them could split equal instructions), and an element is only compared (with __eq__) to the
+    representatives of its bucket, rather than to every element of the other list.
+
+    Returns:
+        A list of tokens for each of the lists
+    """
+    # fingerprint -> [(representative element, token)]
+    buckets = {}
+    next_token = 0
+    token_lists = []
+    for li in lists:
+        tokens = []
+        for element in li:
+            bucket = buckets.setdefault(instruction_fingerprint(element, include_params=False), [])
+            for representative, token in bucket:
+                if _same_element(representative, element):
+                    break
+            else:
+                token = next_token
+                next_token += 1
+                bucket.append((element, token))
+            tokens.append(token)
+        token_lists.append(tokens)
+    return token_lists
+
+
+def common_prefix_length(li1, li2):
+    """
+    Returns the length of the common prefix of the two lists.
+    """
+    max_length = min(len(li1), len(li2))
+    prefix = 0
+    while prefix < max_length and li1[prefix] == li2[prefix]:
+        prefix += 1
+    return prefix
+
+
+def common_suffix_length(li1, li2):
+    """
+    Returns the length of the common suffix of the two lists.
+    """
+    max_length = min(len(li1), len(li2))
+    suffix = 0
+    while suffix < max_length and li1[-1 - suffix] == li2[-1 - suffix]:
+        suffix += 1
+    return suffix
+
+
+def _same_element(element_1, element_2):
+    """
+    Element equality, shortcut for circuit instructions sharing the same operation object (e.g. singleton gates),
+    as comparing operations compares their definitions.
+    """
+    if element_1 is element_2:
+        return True
+    if isinstance(element_1, CircuitInstruction) and isinstance(element_2, CircuitInstruction) \
+            and element_1.operation is element_2.operation:
+        return element_1.qubits == element_2.qubits and element_1.clbits == element_2.clbits
+    return element_1 == element_2
+
+
 def compute_lcs_len(li1, li2, diagnostic=False, timeit=False):
     """
     We generate a matrix f(i,j) containing the lengths of the longest common “substrings” of elements between the
@@ -91,15 +161,50 @@ def compute_lcs_len(li1, li2, diagnostic=False, timeit=False):
     return lcs
 
 
-def diff(li1, li2, diagnostic=False, timeit=False):
+def diff(li1, li2, diagnostic=False, timeit=False, algorithm="lcs", trim=True):
     """
     Computes the diffs of the two lists.
 
     The result is a list of Removals, Additions that convert li1, to li2
+
+    algorithm="lcs" fills the full longest common subsequence table (quadratic time and memory),
+    algorithm="myers" uses myers_diff, whose cost grows with the number of differences instead
+    (both return a shortest list of diffs, but may choose a different one when several exist)
+
+    Elements are interned to integer tokens first, so the algorithms compare integers rather than circuit instructions.
+    With trim=True the end of the lists the algorithm starts from is skipped when it is common to both lists: the common
+    suffix for lcs (its walk back starts from the end) and the common prefix for myers (its search starts from the
+    start). The diffs are then the same as without trimming, which would not hold when trimming the other end (when
+    several shortest lists of diffs exist, the one chosen depends on where the algorithm starts).
     """
     if diagnostic:
         print(f"input 1: {li1}")
         print(f"input 2: {li2}")
+    tokens_1, tokens_2 = intern_instructions(li1, li2)
+    prefix = common_prefix_length(tokens_1, tokens_2) if trim and algorithm == "myers" else 0
+    suffix = common_suffix_length(tokens_1, tokens_2) if trim and algorithm == "lcs" else 0
+    window_1 = tokens_1[prefix:len(tokens_1) - suffix]
+    window_2 = tokens_2[prefix:len(tokens_2) - suffix]
+
+    if algorithm == "lcs":
+        window_diffs = lcs_diff(window_1, window_2, diagnostic=diagnostic, timeit=timeit)
+    elif algorithm == "myers":
+        window_diffs = myers_diff(window_1, window_2, timeit=timeit)
+    else:
+        raise ValueError(f"Unrecognized diff algorithm {algorithm}")
+
+    # indexes in the window are offset by the skipped prefix in both lists,
+    # and the added tokens are replaced by the elements of li2
+    return [Addition(d.location_index + prefix, li2[d.add_gate_index + prefix], d.add_gate_index + prefix)
+            if isinstance(d, Addition) else Removal(d.location_index + prefix) for d in window_diffs]
+
+
+def lcs_diff(li1, li2, diagnostic=False, timeit=False):
+    """
+    Computes the diffs of the two lists by walking back through the table of compute_lcs_len.
+
+    The result is a list of Removals, Additions that convert li1, to li2
+    """
     lcs = compute_lcs_len(li1, li2)
     results = []
     t1 = time.time()
@@ -144,6 +249,72 @@ def diff(li1, li2, diagnostic=False, timeit=False):
     return list(reversed(results))
 
 
+def myers_diff(li1, li2, timeit=False):
+    """
+    Computes the diffs of the two lists with the Myers O(ND) algorithm, where D is the number of diffs.
+
+    Only the furthest reaching x on each diagonal k = x - y of the edit graph is stored for each number of diffs d,
+    so memory is O(D^2) rather than the O(N * M) of compute_lcs_len, and elements are only compared along the
+    explored diagonals. The result is a list of Removals, Additions that convert li1, to li2, in the same format
+    as diff.
+    """
+    t1 = time.time()
+    n = len(li1)
+    m = len(li2)
+
+    # v[k] is the furthest x reached on diagonal k, trace[d] holds v[-d - 1..d + 1] before d diffs are explored
+    v = {1: 0}
+    trace = []
+    for d in range(n + m + 1):
+        trace.append([v.get(k, 0) for k in range(-d - 1, d + 2)])
+        for k in range(-d, d + 1, 2):
+            # move down (an addition) from diagonal k + 1, or right (a removal) from diagonal k - 1
+            if k == -d or (k != d and v[k - 1] < v[k + 1]):
+                x = v[k + 1]
+            else:
+                x = v[k - 1] + 1
+            y = x - k
+            # follow the snake of equal elements
+            while x < n and y < m and li1[x] == li2[y]:
+                x += 1
+                y += 1
+            v[k] = x
+            if x >= n and y >= m:
+                break
+        else:
+            continue
+        break
+
+    # walk back through the trace from (n, m) to recover the diffs
+    results = []
+    x = n
+    y = m
+    for d in range(len(trace) - 1, 0, -1):
+        v_d = trace[d]
+        k = x - y
+        if k == -d or (k != d and v_d[k - 1 + d + 1] < v_d[k + 1 + d + 1]):
+            prev_k = k + 1
+        else:
+            prev_k = k - 1
+        prev_x = v_d[prev_k + d + 1]
+        prev_y = prev_x - prev_k
+        # skip the snake of equal elements
+        while x > prev_x and y > prev_y:
+            x -= 1
+            y -= 1
+        if x == prev_x:
+            results.append(Addition(prev_x, li2[prev_y], prev_y))
+        else:
+            results.append(Removal(prev_x))
+        x = prev_x
+        y = prev_y
+
+    t2 = time.time()
+    if timeit:
+        print(f"time_taken for myers diffing = {t2 - t1}")
+    return list(reversed(results))
+
+
 def apply_diffs(li1, diffs, diagnostic=False, timeit=False):
     """
     Applies a list of diffs onto a list of elements (typically list of circuit instructions).
@@ -1,8 +1,11 @@
 """This file contains useful functions that are re-used throughout the repo."""
 import csv
 import random
+from collections import Counter
 
+import numpy as np
 from qiskit import QuantumCircuit
+from qiskit.circuit import CircuitInstruction, ParameterExpression
 
 
 def get_circuit_register(instruction_arr: list[any]):
@@ -23,6 +26,22 @@ def get_circuit_register(instruction_arr: list[any]):
         return qarg_ret, carg_ret
 
 
+_empty_circuits = {}
+
+
+def empty_circuit(num_qubits, num_clbits):
+    """
+    Returns an empty circuit with the given amount of qubits and clbits, and the set of its bits,
+    copied from a cached template circuit (building the registers is most of the cost of a new circuit).
+    """
+    template = _empty_circuits.get((num_qubits, num_clbits))
+    if template is None:
+        template_qc = QuantumCircuit(num_qubits, num_clbits)
+        template = _empty_circuits[(num_qubits, num_clbits)] = (template_qc,
+                                                                frozenset(template_qc.qubits).union(template_qc.clbits))
+    return template[0].copy_empty_like(), template[1]
+
+
 def list_to_circuit(instruction_arr: list[any]):
     """
     Converts a list of instructions into a quantum circuit object,
@@ -32,14 +51,63 @@ def list_to_circuit(instruction_arr: list[any]):
         instruction_arr) != 0, "Attempted to convert an empty instruction list to a circuit"
     quantum_register, classical_register = get_circuit_register(instruction_arr)
     if classical_register is not None:
-        ret_qc = QuantumCircuit(quantum_register.size, classical_register.size)
+        ret_qc, circuit_bits = empty_circuit(quantum_register.size, classical_register.size)
     else:
-        ret_qc = QuantumCircuit(quantum_register.size, quantum_register.size)
-    for instruction, qargs, cargs in instruction_arr:
-        ret_qc.append(instruction, qargs, cargs)
+        ret_qc, circuit_bits = empty_circuit(quantum_register.size, quantum_register.size)
+    # instructions taken from another circuit's data are already broadcast and validated, so they are appended
+    # directly when their bits belong to the new circuit, skipping the argument conversion of QuantumCircuit.append
+    for circuit_instruction in instruction_arr:
+        if isinstance(circuit_instruction, CircuitInstruction) and not (
+                circuit_bits.issuperset(circuit_instruction.qubits) and circuit_bits.issuperset(
+                circuit_instruction.clbits)):
+            # bits unpickled in another process (e.g. a process pool worker) keep the hash of the process that
+            # created them, so they are not found in the circuit, they are mapped by their index in the register
+            circuit_instruction = circuit_instruction.replace(
+                qubits=tuple(ret_qc.qubits[qarg.index] for qarg in circuit_instruction.qubits),
+                clbits=tuple(ret_qc.clbits[carg.index] for carg in circuit_instruction.clbits))
+        if isinstance(circuit_instruction, CircuitInstruction) and not any(
+                isinstance(param, ParameterExpression) for param in circuit_instruction.operation.params):
+            ret_qc._append(circuit_instruction)
+        else:
+            instruction, qargs, cargs = circuit_instruction
+            ret_qc.append(instruction, qargs, cargs)
     return ret_qc
 
 
+def instruction_fingerprint(instruction, decimals=8, include_params=True):
+    """
+    Returns a hashable fingerprint of a circuit instruction: the gate name, dimensions, rounded parameters, and the
+    qubits and clbits it acts on. Equal instructions have the same fingerprint (up to parameters rounding to
+    different values), elements that are not circuit instructions are their own fingerprint.
+
+    With include_params=False the parameters are left out, so instructions equal up to the tolerance of
+    CircuitInstruction.__eq__ always have the same fingerprint (parameters are then compared by the caller).
+    """
+    if not isinstance(instruction, CircuitInstruction):
+        return instruction
+    operation = instruction.operation
+    if not include_params:
+        return operation.name, operation.num_qubits, operation.num_clbits, instruction.qubits, instruction.clbits
+    params = []
+    for param in operation.params:
+        try:
+            # + 0 so that -0.0 and 0.0 are the same
+            array = np.round(np.asarray(param, dtype=complex), decimals) + 0
+            params.append((array.shape, array.tobytes()))
+        except (TypeError, ValueError):
+            params.append(repr(param))
+    return (operation.name, operation.num_qubits, operation.num_clbits, tuple(params), instruction.qubits,
+            instruction.clbits)
+
+
+def circuit_fingerprint(circuit: QuantumCircuit, decimals=8):
+    """
+    Returns a hashable fingerprint of a circuit: its dimensions and the fingerprints of its instructions.
+    """
+    return (circuit.num_qubits, circuit.num_clbits,
+            tuple(instruction_fingerprint(instruction, decimals) for instruction in circuit.data))
+
+
 def add_random_chaff(circuit: QuantumCircuit, chaff_length=None):
     """
     Adds semantically equivalent changes to a quantum circuit, by adding pairs of unitary matrices:
@@ -95,12 +163,13 @@ def order_list_by_another_list(sublist, superlist, logging=False):
         print(sublist)
         print("super-list:")
         print(superlist)
-    sublist_modifiable_copy = sublist.copy()
+    # remaining occurrences of each element of the sublist, elements must be hashable
+    sublist_remaining = Counter(sublist)
     result = []
     for element in superlist:
-        if element in sublist_modifiable_copy:
+        if sublist_remaining[element] > 0:
             result.append(element)
-            sublist_modifiable_copy.remove(element)
+            sublist_remaining[element] -= 1
     if logging:
         print("re-ordered list:")
         print(result)
@@ -0,0 +1,342 @@
+"""
+Property based test oracle shared by the case studies:
+    - Deltas are applied to the passing circuit to generate the merged circuit to test
+    - The property based tests are executed on the merged circuit (serially or on an executor)
+    - p-values are composed, executing the holm-bonferroni corrections (or another multiple testing correction) to
+    correct for multiple test problem
+    - Failure causing inputs are re-executed on the original failing circuit (verification heuristic), in a single
+    backend job, and holm bonferroni correction is applied again
+"""
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+
+from dd_regression.assertions.multiple_testing import rejection_mask, rejected_indexes
+from dd_regression.assertions.statistical_analysis import measure_qubits_batch, counts_array
+from dd_regression.dd_algorithm import make_executor
+from dd_regression.diff_algorithm import apply_diffs
+from dd_regression.helper_functions import list_to_circuit, circuit_fingerprint
+from dd_regression.result_classes import Passed, Failed, Inconclusive
+
+# measurements of verification circuits, by cache key of the dd run, fingerprint of the circuit (the failing circuit
+# with the input and extra values of the property applied), register, basis and shots. The failing circuit does not
+# change within a dd run, so repeated inputs (e.g. fixed inputs, or few discrete choices) are only measured once.
+# Verifications of a repeated input within a run are therefore not independent: they all reuse one sample, so an
+# unlucky sample makes every configuration verifying that input inconclusive. The cache is only used when the oracle
+# is given a verification_cache_key, unique to the dd run so workers of a process pool (which keep their own cache)
+# never reuse the measurements of another run, random inputs (statevectors, unitaries) essentially never hit it.
+verification_cache = OrderedDict()
+verification_cache_lock = threading.Lock()
+verification_cache_size = 1024
+
+
+# p-value of the oracle, with the index of the property and experiment it comes from
+pair_dtype = np.dtype([('property', np.int64), ('experiment', np.int64), ('p_value', float)])
+
+
+@dataclass(eq=False, frozen=True, slots=True)
+class ExperimentRecord:
+    """
+    Class for the result of a property based test on a single input,
+    p-values and measurements are stored as arrays (cheap to create, and to pickle across processes).
+    """
+    # index of the input within the property based test
+    index: int
+    # the input the circuit is initialised with
+    input_state: object
+    # p-values of the input, as a float array
+    p_values: np.ndarray
+    # counts of the merged circuit (first), and of what it is compared to, as count arrays (see counts_array)
+    measurements: tuple
+    # extra values required to verify the input (e.g. the unitary or integer chosen along with the input)
+    extra_info: tuple = ()
+    # exact probabilities the merged circuit is compared to (see qubit_probabilities), instead of measured counts
+    expected_probabilities: np.ndarray = None
+
+    def __post_init__(self):
+        # the record is frozen, so the converted fields are set through object
+        object.__setattr__(self, 'p_values', np.asarray(self.p_values, dtype=float))
+        object.__setattr__(self, 'measurements', tuple(counts_array(counts) for counts in self.measurements))
+        object.__setattr__(self, 'extra_info', tuple(self.extra_info))
+        if self.expected_probabilities is not None:
+            object.__setattr__(self, 'expected_probabilities', np.asarray(self.expected_probabilities, dtype=float))
+
+    @staticmethod
+    def from_list(experiment):
+        """
+        Converts an experiment in the list form [index, input, p-values, measurements, extra values...]
+        """
+        return ExperimentRecord(experiment[0], experiment[1], experiment[2], experiment[3], experiment[4:])
+
+    @staticmethod
+    def p_value_pairs(property_index, records):
+        """
+        Returns the p-values of the records of a property as a flat array of pair_dtype.
+        """
+        lengths = [len(record.p_values) for record in records]
+        pairs = np.empty(sum(lengths), dtype=pair_dtype)
+        pairs['property'] = property_index
+        pairs['experiment'] = np.repeat([record.index for record in records], lengths)
+        if len(records) > 0:
+            pairs['p_value'] = np.concatenate([record.p_values for record in records])
+        return pairs
+
+
+def property_based_oracle(passing_circuit, failing_circuit, deltas, property_classes, measurements,
+                          significance_level, inputs_to_generate=25, verification=True, incremental=False,
+                          executor=None, max_workers=None, correction_method="holm_bonferroni",
+                          verification_cache_key=None, engine="shots", looks=1):
+    """
+    Returns Passed, Failed or Inconclusive for the deltas applied to the passing circuit.
+
+    Args:
+        passing_circuit: The passing circuit list
+        failing_circuit: The failing circuit list
+        deltas: The deltas to apply to the passing circuit in order to get a merged combination
+        property_classes: The property based tests to execute (PropertyBasedTestInterface classes), inputs of
+            properties with expected_to_fail are failures when no failure is observed
+        measurements: The number of 'shots', measurements made of the circuit for each input generated
+        significance_level: The family wise significance level of the corrections
+        inputs_to_generate: The amount of inputs to generate for each property based test
+        verification: Whether failures are verified against the failing circuit (inconclusive if not reproduced)
+        incremental: Stop executing properties once failures are decided however the p-values still to be produced
+            turn out (bounded by p_values_per_input of the properties), verifying those inputs straight away
+        executor: None to execute the properties one after another, "thread", "process" or a
+            concurrent.futures.Executor to execute them concurrently
+        max_workers: The number of workers of an executor created from a string
+        correction_method: The multiple testing correction of the p-values (see multiple_testing)
+        verification_cache_key: A key unique to the dd run to reuse the verification measurements of repeated inputs
+            within the run (see verification_cache), None to measure every verification anew
+        engine: How the properties and the verification measure the circuits (see measure_qubits_batch)
+        looks: The amount of batches the shots of each input are measured in by the properties (see sequential_test)
+    """
+    if isinstance(executor, str):
+        # executors created here are shut down (and properties not started cancelled) once the oracle returns
+        pool = make_executor(executor, max_workers=max_workers)
+        try:
+            return property_based_oracle(passing_circuit, failing_circuit, deltas, property_classes, measurements,
+                                         significance_level, inputs_to_generate=inputs_to_generate,
+                                         verification=verification, incremental=incremental, executor=pool,
+                                         correction_method=correction_method,
+                                         verification_cache_key=verification_cache_key, engine=engine, looks=looks)
+        finally:
+            pool.shutdown(cancel_futures=True)
+
+    # create quantum circuit by applying diffs to the passing circuit
+    changed_circuit_list = apply_diffs(passing_circuit, deltas)
+    changed_circuit = list_to_circuit(changed_circuit_list)
+
+    composed_results = []
+    p_value_index_pairs = np.empty(0, dtype=pair_dtype)
+    # verification results by property and experiment index, inputs may be verified before all properties ran
+    verification_results = {}
+
+    def verify(indexes):
+        indexes = list(indexes)
+        if len(indexes) == 0:
+            return
+        records = [composed_results[prop_idx][exp_idx] for prop_idx, exp_idx in indexes]
+        experiments = [(property_classes[prop_idx], prop_idx, exp_idx, record.measurements[0], record.input_state,
+                        record.extra_info or None) for (prop_idx, exp_idx), record in zip(indexes, records)]
+        for verification_result in verify_experiments(experiments, failing_circuit, measurements=measurements,
+                                                      cache_key=verification_cache_key, engine=engine):
+            verification_results[(verification_result[0], verification_result[1])] = verification_result
+
+    # with incremental correction, the p-values the properties can produce bound the size of the family, so inputs
+    # failing however the remaining p-values turn out are known (and the oracle can stop) before all properties ran
+    max_pairs = None
+    if incremental and all(p.p_values_per_input is not None for p in property_classes):
+        max_pairs = sum(p.p_values_per_input for p in property_classes) * inputs_to_generate
+
+    for i, property_test_results in run_properties(changed_circuit, property_classes, inputs_to_generate,
+                                                   measurements, executor=executor, engine=engine, looks=looks):
+        composed_results.append(property_test_results)
+
+        # place results in an array that links index of experiment, and property that the property it comes from
+        p_value_index_pairs = np.concatenate([p_value_index_pairs,
+                                              ExperimentRecord.p_value_pairs(i, property_test_results)])
+
+        if max_pairs is not None and i < len(property_classes) - 1:
+            decided_indexes = oracle_failures(
+                corrected_failures(p_value_index_pairs, significance_level, correction_method,
+                                   pending_pairs=max_pairs - len(p_value_index_pairs)),
+                property_classes, composed_results, decided_significance_level=significance_level)
+            if len(decided_indexes) > 0:
+                if not verification:
+                    return Failed()
+                # these inputs fail whatever the remaining properties produce, so they are verified straight away
+                verify(decided_indexes - verification_results.keys())
+                verification_pairs = verification_p_value_pairs(verification_results.values())
+                if len(corrected_failures(verification_pairs, significance_level, correction_method,
+                                          pending_pairs=max_pairs - len(verification_pairs))) > 0:
+                    return Inconclusive()
+
+    # using the array of pvalues, and indexes, apply the multiple testing correction
+    failed_indexes = oracle_failures(corrected_failures(p_value_index_pairs, significance_level, correction_method),
+                                     property_classes, composed_results)
+
+    if not verification:
+        if len(failed_indexes) == 0:
+            return Passed()
+        else:
+            return Failed()
+
+    # inputs verified before all properties ran are not measured again
+    verify(failed_indexes - verification_results.keys())
+
+    verification_p_value_index_pairs = verification_p_value_pairs([verification_results[index]
+                                                                   for index in failed_indexes])
+
+    # using the array of pvalues, and indexes, apply the multiple testing correction
+    verification_failed_indexes = corrected_failures(verification_p_value_index_pairs, significance_level,
+                                                     correction_method)
+
+    # if any state not equal, inconclusive result
+    if len(verification_failed_indexes) > 0:
+        return Inconclusive()
+    elif len(failed_indexes) > 0:
+        return Failed()
+    else:
+        return Passed()
+
+
+def corrected_failures(pairs, significance_level, correction_method, pending_pairs=0):
+    """
+    Returns the (property index, experiment index) pairs of the p-values (an array of pair_dtype) rejected by the
+    multiple testing correction, with pending_pairs p-values still to be added to the family.
+    """
+    mask = rejection_mask(pairs['p_value'], significance_level, method=correction_method, pending=pending_pairs)
+    return rejected_indexes(pairs['property'], pairs['experiment'], mask)
+
+
+def verification_p_value_pairs(verification_results):
+    """
+    Returns the p-values of verification results ([property index, experiment index, p-values]) as a flat array of
+    pair_dtype.
+    """
+    return np.array([(result[0], result[1], p_value) for result in verification_results for p_value in result[2]],
+                    dtype=pair_dtype)
+
+
+def run_properties(circuit, property_classes, inputs_to_generate, measurements, executor=None, engine="shots",
+                   looks=1):
+    """
+    Generator of (property index, experiment records) of the property based tests of the circuit, in the order of
+    property_classes. With an executor all the properties are submitted at once, the ones not started yet are
+    cancelled when the generator is closed early.
+    """
+    if executor is None:
+        for i, property_class in enumerate(property_classes):
+            yield i, as_records(property_class.property_based_test(circuit, inputs_to_generate=inputs_to_generate,
+                                                                   measurements=measurements, engine=engine,
+                                                                   looks=looks))
+        return
+
+    futures = [executor.submit(property_class.property_based_test, circuit, inputs_to_generate, measurements,
+                               engine=engine, looks=looks)
+               for property_class in property_classes]
+    try:
+        for i, future in enumerate(futures):
+            yield i, as_records(future.result())
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def as_records(experiments):
+    """
+    Returns the experiments of a property based test as ExperimentRecord, converting the ones in list form.
+    """
+    return [experiment if isinstance(experiment, ExperimentRecord) else ExperimentRecord.from_list(experiment)
+            for experiment in experiments]
+
+
+def oracle_failures(failed_indexes, property_classes, composed_results, decided_significance_level=None):
+    """
+    Returns the failing (property index, experiment index) pairs of the oracle, from the failing indexes of the
+    multiple testing correction: the inputs of properties expected to fail are failures when they did not fail.
+
+    With decided_significance_level, only the inputs of those properties with every p-value above it are failures
+    (they can never fail), which are decided before all the p-values are known.
+    """
+    expected = {i for i in range(len(composed_results)) if property_classes[i].expected_to_fail}
+    if len(expected) == 0:
+        return failed_indexes
+
+    failures = {(prop_idx, exp_idx) for prop_idx, exp_idx in failed_indexes if prop_idx not in expected}
+    for prop_idx in expected:
+        for experiment in composed_results[prop_idx]:
+            if decided_significance_level is None:
+                not_failed = (prop_idx, experiment.index) not in failed_indexes
+            else:
+                not_failed = all(p_value > decided_significance_level for p_value in experiment.p_values)
+            if not_failed:
+                failures.add((prop_idx, experiment.index))
+    return failures
+
+
+def clear_verification_cache():
+    """
+    Empties the verification cache of this process, releasing the measurements of finished dd runs.
+    """
+    with verification_cache_lock:
+        verification_cache.clear()
+
+
+def verify_experiments(experiments, original_failing_circuit, measurements=1000, cache_key=None, engine="shots"):
+    """
+    Executes the verification heuristic of failed experiments of any property, building the failing circuit once
+    and measuring all the verification circuits in a single backend job. With a cache_key, the measurements of
+    verification circuits measured before under the same key are reused (see verification_cache).
+
+    Args:
+        experiments: A list of (property class, property index, experiment index, output distribution,
+            input state list, extra info) of the failed experiments to verify
+        original_failing_circuit: The original circuit list that we have identified as failure-causing
+        measurements: The number of 'shots', measurements made of the circuit for each input
+        cache_key: The key of the dd run in the verification cache, None to not use the cache
+        engine: How the verification circuits are measured (see measure_qubits_batch)
+    Returns:
+        The list of [property index, experiment index, p-values] of the experiments, in the same order
+    """
+    failing_circuit = list_to_circuit(original_failing_circuit)
+
+    keys, measured = [], []
+    circuits, registers, bases, missing = [], [], [], {}
+    for property_class, _, _, _, input_state_list, extra_info in experiments:
+        circuit, register, basis = property_class.verification_circuit(failing_circuit, input_state_list,
+                                                                       extra_info=extra_info)
+        key = (cache_key, circuit_fingerprint(circuit), tuple(register), tuple(basis), measurements)
+        cached = None
+        if cache_key is not None:
+            with verification_cache_lock:
+                cached = verification_cache.get(key)
+                if cached is not None:
+                    verification_cache.move_to_end(key)
+        keys.append(key)
+        measured.append(cached)
+        # the same verification circuit may occur more than once within the batch
+        if cached is None and key not in missing:
+            missing[key] = len(circuits)
+            circuits.append(circuit)
+            registers.append(register)
+            bases.append(basis)
+
+    if len(circuits) > 0:
+        new_measurements = measure_qubits_batch(circuits, registers, measurements=measurements, bases=bases,
+                                                engine=engine)
+        if cache_key is not None:
+            with verification_cache_lock:
+                for key, idx in missing.items():
+                    verification_cache[key] = new_measurements[idx]
+                while len(verification_cache) > verification_cache_size:
+                    verification_cache.popitem(last=False)
+        measured = [new_measurements[missing[key]] if counts is None else counts
+                    for key, counts in zip(keys, measured)]
+
+    return [[property_index, experiment_index,
+             property_class.verification_p_values(measurements_1, output_distribution, extra_info=extra_info)]
+            for (property_class, property_index, experiment_index, output_distribution, _, extra_info),
+            measurements_1 in zip(experiments, measured)]